@@ -0,0 +1,32 @@
+"""Time to resolve a python location, without and with the persistent cache.
+
+Usage: python bench_location_cache.py [location]
+For example: python bench_location_cache.py conda://rhinoremote
+"""
+import json
+import sys
+import time
+
+from ghpythonremote.helpers import get_extended_env_path_conda, get_python_path
+
+
+def _resolve(location, refresh):
+    start = time.time()
+    python_exe = get_python_path(location, refresh=refresh)
+    get_extended_env_path_conda(python_exe)
+    return time.time() - start
+
+
+def run(location="", n_repeat=5):
+    cold_times = [_resolve(location, refresh=True) for _ in range(n_repeat)]
+    warm_times = [_resolve(location, refresh=False) for _ in range(n_repeat)]
+    return {
+        "location": location,
+        "cold_s": min(cold_times),
+        "warm_s": min(warm_times),
+    }
+
+
+if __name__ == "__main__":
+    location = sys.argv[1] if len(sys.argv) > 1 else ""
+    print(json.dumps(run(location), indent=2))
@@ -0,0 +1,104 @@
+"""Netref creation throughput, without and with the id_pack and inspect caches.
+
+Times get_id_pack and the method tables of inspect requests on their own, then the
+creation of netrefs to new remote objects over an in-process connection, where each
+netref costs a get_id_pack on the serving side and an inspect request. The caches are
+only installed in IronPython, run this benchmark in Rhino for the numbers that
+matter. In CPython, it compares the same functions.
+
+Usage: python bench_netrefs.py [n_objects]
+"""
+import json
+import sys
+import time
+
+from ghpythonremote import monkey, rpyc
+
+protocol = rpyc.core.protocol
+
+
+class Plain(object):
+    pass
+
+
+class Other(object):
+    def method(self):
+        pass
+
+
+def _time_calls(function, objects, n_repeat=5):
+    times = []
+    for _ in range(n_repeat):
+        start = time.time()
+        for obj in objects:
+            function(obj)
+        times.append(time.time() - start)
+    return len(objects) / min(times)
+
+
+def _handle_inspect_cached(self, id_pack):
+    return monkey.get_methods(self._local_objects[id_pack])
+
+
+def _install(get_id_pack, handle_inspect):
+    rpyc.lib.get_id_pack = get_id_pack
+    rpyc.core.netref.get_id_pack = get_id_pack
+    protocol.get_id_pack = get_id_pack
+    protocol.Connection._handle_inspect = handle_inspect
+
+
+def _netrefs_per_s(n_objects, n_repeat=3):
+    connection = rpyc.classic.connect_thread()
+    try:
+        connection.execute("class Remote(object):\n    pass")
+        times = []
+        for _ in range(n_repeat):
+            remote_objects = connection.eval(
+                "[Remote() for _ in range({:d})]".format(n_objects)
+            )
+            start = time.time()
+            for i in range(n_objects):
+                remote_objects[i]
+            times.append(time.time() - start)
+            del remote_objects
+        return n_objects / min(times)
+    finally:
+        connection.close()
+
+
+def run(n_objects=2000):
+    get_id_pack = rpyc.lib.get_id_pack
+    handle_inspect = protocol.Connection._handle_inspect
+    if getattr(get_id_pack, "__name__", "") == "cached_get_id_pack":
+        raise RuntimeError("The caches are already installed, cannot compare.")
+    cached_get_id_pack = monkey.cache_id_pack(get_id_pack)
+
+    objects = [Plain() for _ in range(n_objects // 2)]
+    objects += [Other() for _ in range(n_objects // 2)]
+    objects += [Plain, Other, int, str] * (n_objects // 40)
+    get_methods = lambda obj: tuple(
+        rpyc.lib.get_methods(rpyc.core.netref.LOCAL_ATTRS, obj)
+    )
+
+    results = {
+        "n_objects": n_objects,
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "get_id_pack_per_s": _time_calls(get_id_pack, objects),
+        "cached_get_id_pack_per_s": _time_calls(cached_get_id_pack, objects),
+        "get_methods_per_s": _time_calls(get_methods, objects[:200]),
+        "cached_get_methods_per_s": _time_calls(monkey.get_methods, objects[:200]),
+    }
+    try:
+        _install(get_id_pack, handle_inspect)
+        results["netrefs_per_s"] = _netrefs_per_s(n_objects)
+        _install(cached_get_id_pack, _handle_inspect_cached)
+        results["cached_netrefs_per_s"] = _netrefs_per_s(n_objects)
+    finally:
+        _install(get_id_pack, handle_inspect)
+    return results
+
+
+if __name__ == "__main__":
+    n_objects = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(json.dumps(run(n_objects), indent=2))
@@ -0,0 +1,74 @@
+"""Throughput of deliver/obtain through the socket and through shared memory.
+
+Launches a remote python with GrasshopperToPythonRemote, delivers bytearray payloads
+of 1 MB, 100 MB and 1 GB, and obtains bytearrays of the same sizes built on the
+remote, with and without the memory-mapped side-channel. Each measure is a single
+transfer: bytearrays are not sent by value, so the delivered ones stay on the remote.
+
+Usage: python bench_shared_memory.py [python_exe] [size_in_MB ...]
+"""
+import inspect
+import json
+import logging
+import sys
+import time
+from os import path
+
+import ghpythonremote
+from ghpythonremote.connectors import GrasshopperToPythonRemote
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "pythonservice.py")
+
+MB = 1024 * 1024
+DEFAULT_SIZES_MB = [1, 100, 1024]
+
+
+def _remote_bytearray(gh2py, size):
+    """Payload built on the remote, that stays there."""
+    try:
+        builtins = gh2py.py_remote_modules("__builtin__")
+    except ImportError:
+        builtins = gh2py.py_remote_modules("builtins")
+    return builtins.bytearray(size)
+
+
+def run(python_exe=None, sizes_mb=DEFAULT_SIZES_MB):
+    results = []
+    for threshold in [None, MB // 2]:
+        with GrasshopperToPythonRemote(
+            rpyc_server_py,
+            python_exe=python_exe,
+            timeout=60,
+            log_level=logging.WARNING,
+            shared_memory_threshold=threshold,
+        ) as gh2py:
+            for size_mb in sizes_mb:
+                payload = bytearray(b"x" * (size_mb * MB))
+                start = time.time()
+                remote_payload = gh2py.deliver(payload)
+                deliver_time = time.time() - start
+                del remote_payload
+                remote_payload = _remote_bytearray(gh2py, size_mb * MB)
+                start = time.time()
+                gh2py.obtain(remote_payload)
+                obtain_time = time.time() - start
+                del remote_payload
+                results.append(
+                    {
+                        "transport": "socket" if threshold is None else "shared_memory",
+                        "size_mb": size_mb,
+                        "deliver_s": deliver_time,
+                        "obtain_s": obtain_time,
+                        "deliver_mb_per_s": size_mb / deliver_time,
+                        "obtain_mb_per_s": size_mb / obtain_time,
+                    }
+                )
+                del payload
+    return results
+
+
+if __name__ == "__main__":
+    python_exe = sys.argv[1] if len(sys.argv) > 1 else sys.executable
+    sizes_mb = [int(size) for size in sys.argv[2:]] or DEFAULT_SIZES_MB
+    print(json.dumps(run(python_exe, sizes_mb), indent=2))
@@ -0,0 +1,80 @@
+"""Throughput of multi-megabyte frames through rpyc channels, with the stock rpyc
+socket I/O and with the patched I/O of ghpythonremote.monkey.
+
+Frames go through a local socket pair, without compression to measure the I/O alone.
+
+Usage: python bench_stream.py [size_in_MB ...]
+"""
+import json
+import socket
+import sys
+import threading
+import time
+
+from ghpythonremote import monkey, rpyc
+
+MB = 1024 * 1024
+DEFAULT_SIZES_MB = [1, 16, 64]
+
+stream_class = rpyc.core.stream.SocketStream
+channel_class = rpyc.core.channel.Channel
+
+STOCK = (
+    monkey._rpyc_socket_stream_read,
+    monkey._rpyc_socket_stream_write,
+    monkey._rpyc_channel_recv,
+)
+PATCHED = (stream_class.read, stream_class.write, channel_class.recv)
+
+
+def _install(methods):
+    stream_class.read, stream_class.write, channel_class.recv = methods
+
+
+def _frames_per_s(payload, n_repeat):
+    left, right = socket.socketpair()
+    sender = channel_class(stream_class(left), compress=False)
+    receiver = channel_class(stream_class(right), compress=False)
+
+    def send():
+        for _ in range(n_repeat):
+            sender.send(payload)
+
+    try:
+        thread = threading.Thread(target=send)
+        start = time.time()
+        thread.start()
+        for _ in range(n_repeat):
+            if len(receiver.recv()) != len(payload):
+                raise RuntimeError("Frame received incomplete.")
+        thread.join()
+        return n_repeat / (time.time() - start)
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def run(sizes_mb=DEFAULT_SIZES_MB, n_repeat=5):
+    results = []
+    try:
+        for size_mb in sizes_mb:
+            payload = b"x" * (size_mb * MB)
+            _install(STOCK)
+            stock = _frames_per_s(payload, n_repeat)
+            _install(PATCHED)
+            patched = _frames_per_s(payload, n_repeat)
+            results.append(
+                {
+                    "size_mb": size_mb,
+                    "stock_mb_per_s": size_mb * stock,
+                    "patched_mb_per_s": size_mb * patched,
+                }
+            )
+    finally:
+        _install(PATCHED)
+    return results
+
+
+if __name__ == "__main__":
+    sizes_mb = [int(size) for size in sys.argv[1:]] or DEFAULT_SIZES_MB
+    print(json.dumps(run(sizes_mb), indent=2))
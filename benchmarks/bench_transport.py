@@ -0,0 +1,61 @@
+"""Round-trip latency of the TCP and unix domain socket transports.
+
+Launches a remote python with GrasshopperToPythonRemote for each transport, and
+times many ping requests and remote attribute accesses, which is the traffic that
+netrefs generate.
+
+Usage: python bench_transport.py [python_exe] [n_round_trips]
+"""
+import inspect
+import json
+import logging
+import socket
+import sys
+import time
+from os import path
+
+import ghpythonremote
+from ghpythonremote.connectors import GrasshopperToPythonRemote
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "pythonservice.py")
+
+
+def run(python_exe=None, n_round_trips=2000):
+    transports = ["tcp"]
+    if hasattr(socket, "AF_UNIX"):
+        transports.append("unix")
+    results = []
+    for transport in transports:
+        with GrasshopperToPythonRemote(
+            rpyc_server_py,
+            python_exe=python_exe,
+            timeout=60,
+            log_level=logging.WARNING,
+            transport=transport,
+        ) as gh2py:
+            connection = gh2py.connection
+            remote_sys = gh2py.py_remote_modules("sys")
+            start = time.time()
+            for _ in range(n_round_trips):
+                connection.ping(timeout=10)
+            ping_time = time.time() - start
+            start = time.time()
+            for _ in range(n_round_trips):
+                remote_sys.maxsize
+            getattr_time = time.time() - start
+        results.append(
+            {
+                "transport": transport,
+                "n_round_trips": n_round_trips,
+                "ping_us": 1e6 * ping_time / n_round_trips,
+                "getattr_us": 1e6 * getattr_time / n_round_trips,
+            }
+        )
+    return results
+
+
+if __name__ == "__main__":
+    python_exe = sys.argv[1] if len(sys.argv) > 1 else sys.executable
+    n_round_trips = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    print(json.dumps(run(python_exe, n_round_trips), indent=2))
@@ -0,0 +1,55 @@
+"""Time from connection to the first user object call in a remote Rhino.
+
+The functions of the user objects are created on first access. Before, importing
+ghuserobjects created all of them on each connection, which build_all_s measures.
+
+Usage: python bench_userobjects.py [user_object] [rhino_ver]
+The default user object is the TestClusterGHPythonRemote cluster from the examples,
+it must be installed in Grasshopper.
+"""
+import inspect
+import json
+import logging
+import sys
+import time
+from os import path
+
+import ghpythonremote
+from ghpythonremote.connectors import PythonToGrasshopperRemote
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "ghcompservice.py")
+
+
+def run(user_object="TestClusterGHPythonRemote", rhino_ver=7, args=(3,), kwargs=None):
+    if kwargs is None:
+        kwargs = {"y": 4}
+    start = time.time()
+    with PythonToGrasshopperRemote(
+        None, rpyc_server_py, rhino_ver=rhino_ver, timeout=120, log_level=logging.WARNING
+    ) as py2gh:
+        connect_time = time.time() - start
+        rghuo = py2gh.gh_remote_userobjects
+
+        start = time.time()
+        getattr(rghuo, user_object)(*args, **kwargs)
+        first_call_time = time.time() - start
+
+        start = time.time()
+        rghuo.build_all()
+        build_all_time = time.time() - start
+
+    return {
+        "user_object": user_object,
+        "launch_and_connect_s": connect_time,
+        "first_call_s": first_call_time,
+        "build_all_s": build_all_time,
+        "eager_connection_to_first_call_s": build_all_time + first_call_time,
+        "lazy_connection_to_first_call_s": first_call_time,
+    }
+
+
+if __name__ == "__main__":
+    user_object = sys.argv[1] if len(sys.argv) > 1 else "TestClusterGHPythonRemote"
+    rhino_ver = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    print(json.dumps(run(user_object, rhino_ver), indent=2))
@@ -0,0 +1,58 @@
+"""Time to first call with a freshly launched remote Python, and with a WarmPythonPool.
+
+Usage: python bench_warm_pool.py [python_exe] [module ...]
+"""
+import inspect
+import json
+import logging
+import sys
+import time
+from os import path
+
+import ghpythonremote
+from ghpythonremote.connectors import GrasshopperToPythonRemote
+from ghpythonremote.pools import WarmPythonPool
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "pythonservice.py")
+
+
+def _first_call(gh2py, modules):
+    for module in modules:
+        gh2py.py_remote_modules(module)
+    gh2py.run_py_function("os", "getpid")
+
+
+def run(python_exe=None, modules=("numpy",)):
+    start = time.time()
+    with GrasshopperToPythonRemote(
+        rpyc_server_py, python_exe=python_exe, log_level=logging.WARNING
+    ) as gh2py:
+        _first_call(gh2py, modules)
+        cold_time = time.time() - start
+
+    with WarmPythonPool(
+        rpyc_server_py,
+        size=1,
+        modules=modules,
+        python_exe=python_exe,
+        log_level=logging.WARNING,
+    ) as pool:
+        while pool.n_ready < 1:
+            time.sleep(0.1)
+        start = time.time()
+        with pool.acquire() as gh2py:
+            _first_call(gh2py, modules)
+            warm_time = time.time() - start
+
+    return {
+        "modules": list(modules),
+        "cold_first_call_s": cold_time,
+        "warm_first_call_s": warm_time,
+    }
+
+
+if __name__ == "__main__":
+    python_exe = sys.argv[1] if len(sys.argv) > 1 else sys.executable
+    modules = sys.argv[2:] or ["numpy"]
+    print(json.dumps(run(python_exe, modules), indent=2))
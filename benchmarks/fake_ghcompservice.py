@@ -0,0 +1,109 @@
+"""Stand-in for ghcompservice.py, that runs in CPython without Rhino.
+
+It serves the real GhcompService, with the Grasshopper components replaced by a few
+pure Python functions, to benchmark component calls and pipelines on any platform.
+It is launched like pythonservice.py, by GrasshopperToPythonRemote.
+
+Usage: python fake_ghcompservice.py [port_or_socket_path] [log_level]
+"""
+import logging
+import math
+import os
+import sys
+import threading
+from collections import namedtuple
+
+from ghpythonremote import resultcache, rpyc
+from ghpythonremote.ghcompservice import GhcompService
+from ghpythonremote.pythonservice import AnnouncingOneShotServer, _exit_with_parent
+
+logger = logging.getLogger("ghpythonremote.fake_ghcompservice")
+
+AreaResult = namedtuple("AreaResult", ["area", "centroid"])
+
+
+class FakeComponents(object):
+    """Pure Python stand-ins for a few ghpythonlib.components functions. Points are
+    (x, y, z) tuples."""
+
+    @staticmethod
+    def Addition(a, b):
+        return a + b
+
+    @staticmethod
+    def Series(start, step, count):
+        # Like the real components, returns a list, which crosses as a netref
+        return [start + i * step for i in range(count)]
+
+    @staticmethod
+    def Polygon(center, radius, segments):
+        x, y, z = center
+        return tuple(
+            (
+                x + radius * math.cos(2 * math.pi * i / segments),
+                y + radius * math.sin(2 * math.pi * i / segments),
+                z,
+            )
+            for i in range(segments)
+        )
+
+    @staticmethod
+    def Area(points):
+        area = 0.0
+        cx = cy = 0.0
+        for (x0, y0, _), (x1, y1, _) in zip(points, points[1:] + points[:1]):
+            cross = x0 * y1 - x1 * y0
+            area += cross
+            cx += (x0 + x1) * cross
+            cy += (y0 + y1) * cross
+        area /= 2.0
+        if area == 0:
+            return AreaResult(0.0, points[0])
+        return AreaResult(abs(area), (cx / (6 * area), cy / (6 * area), points[0][2]))
+
+
+class FakeUserObjects(object):
+    def release_all(self):
+        pass
+
+
+class FakeGhcompService(GhcompService):
+    def on_connect(self, conn):
+        logger.info("Incoming connection.")
+        rpyc.ClassicService.on_connect(self, conn)
+        self.ghcomp = FakeComponents
+        self.ghuo = FakeUserObjects()
+        self.result_cache = resultcache.cache
+
+    def on_disconnect(self, conn):
+        logger.info("Disconnected.")
+        self.ghuo.release_all()
+
+
+if __name__ == "__main__":
+    address = sys.argv[1] if len(sys.argv) >= 2 else "18871"
+    log_level = int(sys.argv[2]) if len(sys.argv) >= 3 else logging.WARNING
+    try:
+        port, socket_path = int(address), None
+    except (TypeError, ValueError):
+        port, socket_path = None, address
+    logging.basicConfig(level=log_level)
+
+    if os.environ.get("GHPYTHONREMOTE_WATCH_STDIN"):
+        watchdog = threading.Thread(target=_exit_with_parent)
+        watchdog.daemon = True
+        watchdog.start()
+
+    if socket_path is None:
+        server = AnnouncingOneShotServer(
+            FakeGhcompService, hostname="localhost", port=port, listener_timeout=None
+        )
+    else:
+        server = AnnouncingOneShotServer(
+            FakeGhcompService, socket_path=socket_path, listener_timeout=None
+        )
+    try:
+        server.start()
+    finally:
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,243 @@
+"""Benchmark suite of the remote Python plumbing, that runs without Rhino.
+
+Launches pythonservice.py with GrasshopperToPythonRemote, and measures the connection
+time, the latency of empty calls and of remote attribute accesses, and the throughput
+of deliver/obtain and of the streaming obtain_iter across payload sizes. Component
+calls and pipelines are measured against fake_ghcompservice.py, a stand-in for
+ghcompservice.py that serves the real GhcompService with pure Python components.
+
+Results are printed, or written to a file, as a single JSON document for regression
+tracking. Times are in seconds, latencies in microseconds.
+
+Usage: python run_suite.py [--python-exe PATH] [--transport tcp|unix] [--quick]
+                           [--output FILE]
+"""
+import argparse
+import datetime
+import inspect
+import json
+import logging
+import platform
+import sys
+import time
+from os import path
+
+import ghpythonremote
+from ghpythonremote import pipelines, rpyc
+from ghpythonremote.connectors import GrasshopperToPythonRemote
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "pythonservice.py")
+fake_ghcomp_server_py = path.join(
+    path.abspath(path.dirname(__file__)), "fake_ghcompservice.py"
+)
+
+KB = 1024
+MB = 1024 * KB
+DEFAULT_SIZES = [KB, 64 * KB, MB, 16 * MB]
+QUICK_SIZES = [KB, MB]
+STREAM_CHUNK_SIZE = 256 * KB
+
+
+def _stats(times, n_calls=1):
+    """Summary of repeated measures, each of n_calls calls, in microseconds per
+    call."""
+    per_call = sorted(1e6 * t / n_calls for t in times)
+    return {
+        "min_us": per_call[0],
+        "median_us": per_call[len(per_call) // 2],
+        "mean_us": sum(per_call) / len(per_call),
+    }
+
+
+def _repeat(function, n_calls, n_repeat):
+    times = []
+    for _ in range(n_repeat):
+        start = time.time()
+        for _ in range(n_calls):
+            function()
+        times.append(time.time() - start)
+    return _stats(times, n_calls)
+
+
+def _connector(python_exe, transport, server_py=rpyc_server_py):
+    return GrasshopperToPythonRemote(
+        server_py,
+        python_exe=python_exe,
+        timeout=60,
+        log_level=logging.WARNING,
+        transport=transport,
+    )
+
+
+def bench_connect(python_exe, transport, n_repeat):
+    """Time to launch the remote python, connect, and close."""
+    connect_times = []
+    close_times = []
+    for _ in range(n_repeat):
+        start = time.time()
+        gh2py = _connector(python_exe, transport)
+        connect_times.append(time.time() - start)
+        start = time.time()
+        gh2py.close()
+        close_times.append(time.time() - start)
+    return {
+        "connect_s": min(connect_times),
+        "connect_median_s": sorted(connect_times)[len(connect_times) // 2],
+        "close_s": min(close_times),
+    }
+
+
+def bench_latency(gh2py, n_calls, n_repeat):
+    """Latency of a round trip without payload, of a remote function call, and of a
+    remote attribute access, which is the traffic that netrefs generate."""
+    connection = gh2py.connection
+    remote_sys = gh2py.py_remote_modules("sys")
+    return {
+        "ping": _repeat(lambda: connection.ping(timeout=10), n_calls, n_repeat),
+        "empty_call": _repeat(
+            lambda: gh2py.run_py_function("os", "getpid"), n_calls, n_repeat
+        ),
+        "getattr": _repeat(lambda: remote_sys.maxsize, n_calls, n_repeat),
+    }
+
+
+def _remote_bytearray(gh2py, size):
+    """Payload built on the remote, that stays there."""
+    try:
+        builtins = gh2py.py_remote_modules("__builtin__")
+    except ImportError:
+        builtins = gh2py.py_remote_modules("builtins")
+    return builtins.bytearray(size)
+
+
+def bench_throughput(gh2py, sizes, n_repeat):
+    """Throughput of deliver of bytearray payloads, and of obtain and obtain_iter of
+    bytearrays built on the remote, with the time until the first chunk."""
+    results = []
+    for size in sizes:
+        # Not sent by value, so deliver does not copy it back
+        payload = bytearray(b"x" * size)
+        deliver_times = []
+        obtain_times = []
+        first_chunk_times = []
+        stream_times = []
+        for _ in range(n_repeat):
+            start = time.time()
+            remote_payload = gh2py.deliver(payload)
+            deliver_times.append(time.time() - start)
+            del remote_payload
+            remote_bytes = _remote_bytearray(gh2py, size)
+            start = time.time()
+            gh2py.obtain(remote_bytes)
+            obtain_times.append(time.time() - start)
+            start = time.time()
+            chunks = gh2py.obtain_iter(remote_bytes, chunk_size=STREAM_CHUNK_SIZE)
+            for i, _ in enumerate(chunks):
+                if i == 0:
+                    first_chunk_times.append(time.time() - start)
+            stream_times.append(time.time() - start)
+            del remote_bytes
+        deliver_time = min(deliver_times)
+        obtain_time = min(obtain_times)
+        stream_time = min(stream_times)
+        results.append(
+            {
+                "size_bytes": size,
+                "deliver_s": deliver_time,
+                "obtain_s": obtain_time,
+                "deliver_mb_per_s": float(size) / MB / max(deliver_time, 1e-9),
+                "obtain_mb_per_s": float(size) / MB / max(obtain_time, 1e-9),
+                "obtain_iter_first_chunk_s": min(first_chunk_times),
+                "obtain_iter_s": stream_time,
+                "obtain_iter_mb_per_s": float(size) / MB / max(stream_time, 1e-9),
+            }
+        )
+        del payload
+    return results
+
+
+def bench_components(python_exe, transport, n_calls, n_repeat):
+    """Component calls and pipelines against the GhcompService stand-in."""
+    with _connector(python_exe, transport, fake_ghcomp_server_py) as gh2py:
+        root = gh2py.connection.root
+        polygon = root.get_component("Polygon")
+        area = root.get_component("Area")
+        results = {
+            "lookup_and_call": _repeat(
+                lambda: root.get_component("Addition")(1, 2), n_calls, n_repeat
+            ),
+            "call": _repeat(lambda: polygon((0, 0, 0), 1.0, 8), n_calls, n_repeat),
+            "list_output_call": _repeat(
+                lambda: list(root.get_component("Series")(0, 1, 16)),
+                n_calls,
+                n_repeat,
+            ),
+        }
+
+        def chained_calls():
+            return area(polygon((0, 0, 0), 1.0, 8)).area
+
+        pipeline = pipelines.Pipeline()
+        step = pipeline.add("Polygon", (0, 0, 0), 1.0, 8)
+        step = pipeline.add("Area", step)
+        spec = pipeline.spec()
+        outputs = pipeline.encode_outputs([step["area"]])
+        results["chained_calls"] = _repeat(chained_calls, n_calls, n_repeat)
+        results["pipeline"] = _repeat(
+            lambda: root.run_pipeline(spec, outputs), n_calls, n_repeat
+        )
+
+        cache = root.result_cache
+        cache.enable("Polygon")
+        polygon = root.get_component("Polygon")
+        polygon((0, 0, 0), 1.0, 8)
+        results["cached_call"] = _repeat(
+            lambda: polygon((0, 0, 0), 1.0, 8), n_calls, n_repeat
+        )
+        cache.disable()
+    return results
+
+
+def run(python_exe=None, transport="tcp", quick=False):
+    if python_exe is None:
+        python_exe = sys.executable
+    n_repeat = 3 if quick else 7
+    n_calls = 100 if quick else 1000
+    sizes = QUICK_SIZES if quick else DEFAULT_SIZES
+
+    results = {
+        "meta": {
+            "ghpythonremote_version": ghpythonremote.__version__,
+            "rpyc_version": ".".join(str(num) for num in rpyc.version.version),
+            "python_version": platform.python_version(),
+            "python_exe": python_exe,
+            "platform": platform.platform(),
+            "transport": transport,
+            "quick": quick,
+            "date": datetime.datetime.utcnow().isoformat() + "Z",
+        },
+        "connect": bench_connect(python_exe, transport, n_repeat),
+    }
+    with _connector(python_exe, transport) as gh2py:
+        results["latency"] = bench_latency(gh2py, n_calls, n_repeat)
+        results["throughput"] = bench_throughput(gh2py, sizes, n_repeat)
+    results["components"] = bench_components(python_exe, transport, n_calls, n_repeat)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--python-exe", default=sys.executable)
+    parser.add_argument("--transport", default="tcp", choices=["tcp", "unix"])
+    parser.add_argument("--quick", action="store_true", help="fewer, smaller runs")
+    parser.add_argument("--output", help="write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = run(args.python_exe, args.transport, args.quick)
+    document = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(document + "\n")
+    else:
+        print(document)
@@ -2,3 +2,4 @@ from ghpythonremote.version import __version__
 import monkey
 from monkey import rpyc
 from rpyc.utils.classic import deliver, obtain
+from streaming import obtain_iter
@@ -0,0 +1,161 @@
+"""Bulk transfer of homogeneous numerical arrays.
+
+Values are packed in a single contiguous typed buffer, sent with a small
+(dtype, shape) header, so that brine encodes one string instead of one item per
+element. This module is imported on both sides of the connection: numpy is only
+needed on the side that builds or reads a numpy.ndarray.
+"""
+import array
+import logging
+
+from . import sharedmem
+
+logger = logging.getLogger("ghpythonremote.arrays")
+
+# numpy dtype name -> array module typecode. Only types that have the same item size
+# in IronPython and in CPython on Windows and MacOS are listed.
+TYPECODES = {
+    "float64": "d",
+    "float32": "f",
+    "int32": "i",
+    "uint32": "I",
+    "int16": "h",
+    "uint16": "H",
+    "int8": "b",
+    "uint8": "B",
+}
+
+
+def _get_typecode(dtype):
+    try:
+        return TYPECODES[str(dtype)]
+    except KeyError:
+        raise TypeError(
+            "Unsupported dtype {!s} for bulk array transfer, use one of {!s}.".format(
+                dtype, ", ".join(sorted(TYPECODES))
+            )
+        )
+
+
+def _flatten(values):
+    """Flatten nested sequences of numbers, and infer their shape."""
+    flat = list(values)
+    shape = [len(flat)]
+    while flat and isinstance(flat[0], (list, tuple)):
+        dim = len(flat[0])
+        next_flat = []
+        for item in flat:
+            if len(item) != dim:
+                raise ValueError("Cannot pack a ragged nested sequence as an array.")
+            next_flat.extend(item)
+        shape.append(dim)
+        flat = next_flat
+    return flat, tuple(shape)
+
+
+def _product(shape):
+    size = 1
+    for dim in shape:
+        size *= dim
+    return size
+
+
+def pack(values, dtype="float64", shape=None):
+    """Pack a sequence of numbers into a typed buffer.
+
+    Parameters
+    ----------
+    values : iterable
+        Flat or nested (list of lists) sequence of numbers, or an array.array.
+    dtype : str
+        numpy name of the type of the elements, one of the keys of TYPECODES.
+    shape : tuple of int
+        Shape of the array. By default, inferred from the nesting of values.
+
+    Returns
+    -------
+    (dtype, shape, buffer), to be unpacked with to_ndarray or unpack.
+    """
+    typecode = _get_typecode(dtype)
+    if isinstance(values, array.array) and values.typecode == typecode:
+        packed = values
+        inferred_shape = (len(values),)
+    else:
+        flat, inferred_shape = _flatten(values)
+        packed = array.array(typecode, flat)
+    if shape is None:
+        shape = inferred_shape
+    shape = tuple(int(dim) for dim in shape)
+    if _product(shape) != len(packed):
+        raise ValueError(
+            "Cannot pack {:d} values in an array of shape {!s}.".format(
+                len(packed), shape
+            )
+        )
+    return str(dtype), shape, packed.tostring()
+
+
+def unpack(dtype, shape, buf, flat=False):
+    """Unpack a typed buffer into nested lists following shape, a list for a 1-D
+    shape, or a flat array.array if flat is True.
+
+    buf can also be a sharedmem payload wrapping the typed buffer.
+    """
+    if isinstance(buf, tuple):
+        buf = sharedmem.unpack_bytes(buf)
+    values = array.array(_get_typecode(dtype))
+    values.fromstring(buf)
+    if flat:
+        return values
+    return _nest(values.tolist(), shape)
+
+
+def _nest(flat, shape):
+    for dim in reversed(shape[1:]):
+        flat = [flat[i : i + dim] for i in range(0, len(flat), dim)]
+    return flat
+
+
+def to_ndarray(dtype, shape, buf, copy=False):
+    """Build a numpy.ndarray from a typed buffer, without copying it by default.
+
+    Without copy, the array is a read-only view on the received buffer. buf can also
+    be a sharedmem payload wrapping the typed buffer.
+    """
+    import numpy
+
+    if isinstance(buf, tuple):
+        buf = sharedmem.unpack_bytes(buf)
+    result = numpy.frombuffer(buf, dtype=numpy.dtype(str(dtype))).reshape(shape)
+    if copy:
+        result = result.copy()
+    return result
+
+
+def from_ndarray(values, dtype=None, threshold=None):
+    """Pack a numpy.ndarray, or anything numpy.asarray accepts, into a typed buffer.
+
+    Parameters
+    ----------
+    values : array-like
+        Array to pack.
+    dtype : str
+        Cast the array to that type before packing. Required if the type of the array
+        is not one of the keys of TYPECODES (for example int64).
+    threshold : int
+        If given, wrap the buffer in a sharedmem payload, sent through shared memory
+        if it is at least that many bytes.
+
+    Returns
+    -------
+    (dtype, shape, buffer), to be unpacked with unpack.
+    """
+    import numpy
+
+    values = numpy.ascontiguousarray(values, dtype=dtype)
+    dtype = values.dtype.name
+    _get_typecode(dtype)
+    buf = values.tobytes()
+    if threshold is not None:
+        buf = sharedmem.pack_bytes(buf, threshold)
+    return dtype, tuple(int(dim) for dim in values.shape), buf
@@ -3,9 +3,28 @@ import logging
 import os
 import socket
 import subprocess
-from time import sleep
+import tempfile
+import threading
+import uuid
+from time import sleep, time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
 
 from ghpythonremote import rpyc
+from . import (
+    arrays,
+    geometrycodec,
+    meshbuffers,
+    pipelines,
+    remoteoutput,
+    sharedmem,
+    streaming,
+    tracing,
+)
+from .pythonservice import SERVER_MODES
 from .helpers import (
     get_python_path,
     get_extended_env_path_conda,
@@ -15,6 +34,17 @@ from .helpers import (
 
 logger = logging.getLogger("ghpythonremote.connectors")
 
+TRANSPORTS = ("tcp", "unix")
+# Errors raised while the remote server is not listening yet
+NOT_READY_ERRNOS = (errno.ECONNREFUSED, errno.ENOENT)
+# Seconds between connection attempts, when the remote cannot announce it is ready
+CONNECT_POLL_INTERVAL = 0.1
+
+# Remote pythons running in threaded server mode, shared by all the connectors that
+# launch the same interpreter and server with the same settings
+_shared_servers = {}
+_shared_servers_lock = threading.Lock()
+
 
 class GrasshopperToPythonRemote:
     def __init__(
@@ -27,9 +57,14 @@ class GrasshopperToPythonRemote:
         port=None,
         log_level=logging.WARNING,
         working_dir=None,
+        shared_memory_threshold=None,
+        transport="tcp",
+        refresh_location=False,
+        server_mode="oneshot",
+        output_retention=remoteoutput.DEFAULT_RETENTION,
     ):
         if python_exe is None:
-            self.python_exe = get_python_path(location)
+            self.python_exe = get_python_path(location, refresh=refresh_location)
         else:
             if location is not None:
                 logger.debug(
@@ -38,19 +73,33 @@ class GrasshopperToPythonRemote:
                 )
             self.python_exe = python_exe
         self.env = get_extended_env_path_conda(self.python_exe)
+        # Have the remote stop when this process exits and closes its stdin pipe
+        self.env["GHPYTHONREMOTE_WATCH_STDIN"] = "1"
         self.rpyc_server_py = rpyc_server_py
         self.timeout = timeout
         self.retry = 0
         self.max_retry = max(0, max_retry)
         self.log_level = log_level
         self.working_dir = working_dir
-        if port is None:
-            self.port = _get_free_tcp_port()
+        self.shared_memory_threshold = shared_memory_threshold
+        self.transport = _check_transport(transport)
+        if self.transport == "unix":
+            self.port = None
+            self.socket_path = _get_socket_path()
         else:
-            self.port = port
-        self.python_popen = self._launch_python()
+            # With port 0, the remote binds any free port, and announces it
+            self.port = 0 if port is None else port
+            self.socket_path = None
+        self._bind_port = self.port
+        self.server_mode = _check_server_mode(server_mode)
+        self.output_retention = output_retention
+        self._shared_server = None
+        self._start_python()
         self.connection = self._get_connection()
         self.py_remote_modules = self.connection.root.getmodule
+        self._remote_run_block = None
+        # Remote functions by (module_name, function_name), to look them up only once
+        self._function_handles = {}
 
     def __enter__(self):
         return self
@@ -80,15 +129,15 @@ class GrasshopperToPythonRemote:
 
     def run_py_function(self, module_name, function_name, *nargs, **kwargs):
         """Run a specific Python function on the remote, with Python crash handling."""
-        remote_module = self.py_remote_modules(module_name)
-        function = getattr(remote_module, function_name)
         function_output = kwargs.pop("function_output", None)
 
         try:
+            function = self._get_py_function(module_name, function_name)
             result = function(*nargs, **kwargs)
         except (socket.error, EOFError):
             self._rebuild_py_remote()
-            return self.run_py_function(*nargs, **kwargs)
+            kwargs["function_output"] = function_output
+            return self.run_py_function(module_name, function_name, *nargs, **kwargs)
 
         if function_output is not None:
             try:
@@ -97,87 +146,419 @@ class GrasshopperToPythonRemote:
                 pass
         return result
 
+    def run_py_function_async(self, module_name, function_name, *nargs, **kwargs):
+        """Send a call to a Python function on the remote, without waiting for it.
+
+        Takes the same arguments as run_py_function. Several calls sent in a row are
+        pipelined over the connection, instead of waiting for each round trip.
+
+        Returns
+        -------
+        RemoteFuture of the result. If Python crashes before the result arrives, the
+        call is run again with run_py_function, that reconnects.
+
+        Examples
+        --------
+        >>> futures = [
+        >>>     gh2py.run_py_function_async("math", "sqrt", x) for x in range(50)
+        >>> ]
+        >>> roots = gather(*futures)
+        """
+        function_output = kwargs.pop("function_output", None)
+
+        try:
+            function = self._get_py_function(module_name, function_name)
+            async_result = rpyc.async_(function)(*nargs, **kwargs)
+        except (socket.error, EOFError):
+            self._rebuild_py_remote()
+            kwargs["function_output"] = function_output
+            return self.run_py_function_async(
+                module_name, function_name, *nargs, **kwargs
+            )
+
+        def retry():
+            return self.run_py_function(
+                module_name,
+                function_name,
+                *nargs,
+                function_output=function_output,
+                **kwargs
+            )
+
+        return RemoteFuture(async_result, output=function_output, retry=retry)
+
+    def run_block(self, source, inputs=None, outputs=None):
+        """Execute a block of code on the remote, in a single round trip.
+
+        The inputs are pickled and sent in one message, the code is compiled once on
+        the remote and cached, and the outputs are sent back pickled in one message.
+        This avoids the round trips of every attribute access and call on netrefs.
+
+        Parameters
+        ----------
+        source : str
+            Python code to execute on the remote.
+        inputs : dict
+            Variables to define before executing the code. Values must be picklable.
+        outputs : iterable of str
+            Names of the variables to return. By default, all the variables that the
+            code defines, except modules, callables, and names starting with "_".
+
+        Returns
+        -------
+        dict of the outputs, with numpy arrays converted to lists.
+
+        Examples
+        --------
+        >>> gh2py.run_block(
+        >>>     "import numpy as np; a = np.linspace(0, 1, n); b = np.sin(a).sum()",
+        >>>     inputs={"n": 100},
+        >>>     outputs=["b"],
+        >>> )
+        """
+        if outputs is not None:
+            outputs = tuple(outputs)
+        payload = sharedmem.dumps(inputs or {}, self.shared_memory_threshold)
+        try:
+            if self._remote_run_block is None:
+                self._remote_run_block = self.connection.root.run_block
+            result = self._remote_run_block(
+                source, payload, outputs, self.shared_memory_threshold
+            )
+        except (socket.error, EOFError):
+            self._rebuild_py_remote()
+            return self.run_block(source, inputs, outputs)
+        return sharedmem.loads(result)
+
+    def send_array(self, values, dtype="float64", shape=None, copy=False):
+        """Send numbers to the remote as a numpy.ndarray, in a single message.
+
+        The values are packed locally in one typed buffer, that numpy reads directly
+        on the remote. This is much faster than ``np.array(values)`` or
+        ``ghpythonremote.deliver``, that transfer elements one by one.
+
+        Parameters
+        ----------
+        values : iterable
+            Flat or nested (list of lists) sequence of numbers.
+        dtype : str
+            numpy name of the type of the array, from arrays.TYPECODES.
+        shape : tuple of int
+            Shape of the remote array. By default, inferred from the nesting of
+            values.
+        copy : bool
+            By default, the remote array is a read-only view on the received
+            buffer. Set to True to get a writeable copy.
+
+        Returns
+        -------
+        Netref to the remote numpy.ndarray.
+        """
+        dtype, shape, buf = arrays.pack(values, dtype=dtype, shape=shape)
+        if self.shared_memory_threshold is not None:
+            buf = sharedmem.pack_bytes(buf, self.shared_memory_threshold)
+        return self.run_py_function(
+            "ghpythonremote.arrays", "to_ndarray", dtype, shape, buf, copy=copy
+        )
+
+    def fetch_array(self, remote_array, dtype=None, flat=False):
+        """Get the values of a remote numpy.ndarray, in a single message.
+
+        Parameters
+        ----------
+        remote_array : netref
+            Remote numpy.ndarray, or anything that numpy.asarray accepts.
+        dtype : str
+            Cast the remote array to that type first. Required for types that are not
+            in arrays.TYPECODES, for example int64.
+        flat : bool
+            Return the values as a flat array.array instead of nested lists.
+
+        Returns
+        -------
+        Nested lists following the shape of the array, or a flat array.array.
+        """
+        dtype, shape, buf = self.run_py_function(
+            "ghpythonremote.arrays",
+            "from_ndarray",
+            remote_array,
+            dtype=dtype,
+            threshold=self.shared_memory_threshold,
+        )
+        return arrays.unpack(dtype, shape, buf, flat=flat)
+
+    def send_mesh(self, mesh, normals=True, colors=True):
+        """Send a Rhino mesh to the remote as numpy arrays, in a single message.
+
+        The lists of the mesh are copied in bulk into typed buffers, instead of
+        iterating its vertices and faces through netrefs, see meshbuffers.
+
+        Parameters
+        ----------
+        mesh : Rhino.Geometry.Mesh
+            Mesh to send.
+        normals, colors : bool
+            Send the vertex normals, and the vertex colors.
+
+        Returns
+        -------
+        Netref to the remote meshbuffers.MeshBuffers of numpy arrays: vertices (n, 3)
+        float32, faces (m, 4) int32, normals (n, 3) float32 and colors (n, 4) uint8
+        R, G, B, A, None when missing.
+        """
+        packed = meshbuffers.export_mesh(
+            mesh, normals, colors, self.shared_memory_threshold
+        )
+        return self.run_py_function("ghpythonremote.meshbuffers", "to_value", packed)
+
+    def fetch_mesh(self, vertices, faces, normals=None, colors=None):
+        """Build a Rhino mesh from remote arrays, in a single message.
+
+        Parameters
+        ----------
+        vertices, faces, normals, colors : netref
+            Remote arrays, see meshbuffers.from_value. For example the vertices and
+            faces of a remote trimesh.Trimesh, or the fields of the result of
+            send_mesh.
+
+        Returns
+        -------
+        Rhino.Geometry.Mesh
+        """
+        packed = self.run_py_function(
+            "ghpythonremote.meshbuffers",
+            "from_value",
+            vertices,
+            faces,
+            normals,
+            colors,
+            threshold=self.shared_memory_threshold,
+        )
+        return meshbuffers.import_mesh(*packed)
+
+    def deliver(self, obj):
+        """Copy a local object to the remote, like ghpythonremote.deliver.
+
+        Payloads of at least shared_memory_threshold bytes go through shared memory
+        instead of the socket.
+
+        Returns
+        -------
+        Netref to the remote copy of obj. Values that brine sends by value, like str,
+        numbers or tuples, come back by value.
+        """
+        payload = sharedmem.dumps(obj, self.shared_memory_threshold)
+        try:
+            loads = self._get_py_function("ghpythonremote.sharedmem", "loads")
+            return loads(payload)
+        except (socket.error, EOFError):
+            # A shared payload can only be loaded once, make a new one
+            self._rebuild_py_remote()
+            return self.deliver(obj)
+
+    def obtain(self, remote_obj):
+        """Copy a remote object to the local, like ghpythonremote.obtain.
+
+        Payloads of at least shared_memory_threshold bytes go through shared memory
+        instead of the socket.
+        """
+        payload = self.run_py_function(
+            "ghpythonremote.sharedmem",
+            "dumps",
+            remote_obj,
+            self.shared_memory_threshold,
+        )
+        return sharedmem.loads(payload)
+
+    def obtain_iter(
+        self,
+        remote_obj,
+        chunk_size=streaming.DEFAULT_CHUNK_SIZE,
+        prefetch=streaming.DEFAULT_PREFETCH,
+        as_numpy=True,
+    ):
+        """Copy a remote object to the local in chunks, as they arrive.
+
+        Unlike obtain, the remote never serializes more than the chunks asked for,
+        and the first chunk can be processed while the next ones are in flight. See
+        streaming.obtain_iter for the parameters.
+
+        Returns
+        -------
+        Generator of the values of the chunks: str slices, rows of numpy arrays (as
+        nested lists without numpy), or lists of items.
+        """
+        streaming.check_remote(remote_obj)
+        cursor = self.run_py_function(
+            "ghpythonremote.streaming", "Cursor", remote_obj, chunk_size
+        )
+        return streaming.iter_chunks(cursor, prefetch, as_numpy)
+
+    def trace(self, record_calls=True, max_records=10000):
+        """Count and record the requests sent to the remote Python, to find chatty code.
+
+        Returns
+        -------
+        tracing.RPCTrace of the current connection, to use as a context manager.
+
+        Examples
+        --------
+        >>> with gh2py.trace() as t:
+        >>>     rpy.modules.numpy.array(x).mean()
+        >>> t.summary()["counts"]
+        {'getattr': 4, 'call': 2, 'callattr': 1, 'inspect': 3, 'del': 2}
+        >>> print(t.format())
+        """
+        return tracing.RPCTrace(self.connection, record_calls, max_records)
+
+    def remote_output(self, n=None):
+        """Return the last n lines, or all the lines kept, that the remote Python wrote
+        to its stdout and stderr, oldest first. See output_retention."""
+        return self.output.lines(n)
+
     def close(self):
         if not self.connection.closed:
             logger.info("Closing connection.")
             self.connection.close()
+        if self.server_mode == "threaded":
+            if self._shared_server is not None:
+                _release_shared_server(self._shared_server)
+                self._shared_server = None
+            return
         if self.python_popen.poll() is None:
             logger.info("Closing Python.")
             self.python_popen.terminate()
+        self.output.join(1)
+        _remove_socket_path(self.socket_path)
+
+    def _get_py_function(self, module_name, function_name):
+        key = (module_name, function_name)
+        try:
+            return self._function_handles[key]
+        except KeyError:
+            pass
+        function = getattr(self.py_remote_modules(module_name), function_name)
+        self._function_handles[key] = function
+        return function
+
+    def _start_python(self):
+        """Launch the remote python and wait until it listens. In threaded server mode,
+        reuse the remote python already launched with the same settings, if any."""
+        if self.server_mode != "threaded":
+            self.python_popen = self._launch_python()
+            self._set_address(self._wait_for_server())
+            return
+        key = (
+            self.python_exe,
+            self.rpyc_server_py,
+            self.working_dir,
+            self.transport,
+            self._bind_port,
+        )
+        with _shared_servers_lock:
+            server = _shared_servers.get(key)
+            if server is not None and server.popen.poll() is None:
+                logger.info("Reusing the running remote python.")
+                server.n_users += 1
+            else:
+                self.python_popen = self._launch_python()
+                self._set_address(self._wait_for_server())
+                server = _SharedServer(
+                    self.python_popen, self.output, self.port, self.socket_path
+                )
+                _shared_servers[key] = server
+        self._shared_server = server
+        self.python_popen = server.popen
+        self.output = server.output
+        self.port = server.port
+        self.socket_path = server.socket_path
+
+    def _set_address(self, address):
+        if self.transport == "tcp":
+            self.port = int(address)
 
     def _launch_python(self):
         logger.debug("Using python executable: {!s}".format(self.python_exe))
         logger.debug("Using rpyc_server module: {!s}".format(self.rpyc_server_py))
+        logger.debug("Using transport: {!s}".format(self.transport))
         logger.debug("Using port: {}".format(self.port))
+        logger.debug("Using socket_path: {!s}".format(self.socket_path))
         logger.debug("Using log_level: {!s}".format(self.log_level))
         logger.debug("Using working_dir: {!s}".format(self.working_dir))
+        logger.debug("Using server_mode: {!s}".format(self.server_mode))
         assert self.python_exe is not "" and self.python_exe is not None
         assert self.rpyc_server_py is not "" and self.rpyc_server_py is not None
-        assert self.port is not "" and self.port is not None
+        address = self.socket_path if self.transport == "unix" else self._bind_port
+        assert address is not "" and address is not None
         assert self.log_level is not "" and self.log_level is not None
         python_call = [
             self.python_exe,
             self.rpyc_server_py,
-            str(self.port),
-            self.log_level,
+            str(address),
+            str(self.log_level),
+            self.server_mode,
         ]
         cwd = self.working_dir
+        # Buffered pipes, otherwise readline reads one byte at a time in Python 2
         python_popen = subprocess.Popen(
             python_call,
+            bufsize=-1,
             stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             stdin=subprocess.PIPE,
             cwd=cwd,
             env=self.env,
         )
+        # Read the output continuously, a full pipe would block the remote
+        self._announcements = queue.Queue()
+        self.output = remoteoutput.OutputDrain(self.output_retention)
+        self.output.drain(
+            python_popen.stdout, "stdout", announcements=self._announcements
+        )
+        self.output.drain(python_popen.stderr, "stderr", log_level=logging.INFO)
         return python_popen
 
     def _get_connection(self):
-        connection = None
         logger.info("Connecting...")
-        for i in range(self.timeout):
-            try:
-                if not connection:
-                    logger.debug(
-                        "Connecting. Timeout in {:d} seconds.".format(self.timeout - i)
-                    )
-                    connection = rpyc.utils.factory.connect(
-                        "localhost",
-                        self.port,
-                        service=rpyc.core.service.ClassicService,
-                        config={"sync_request_timeout": None},
-                        ipv6=False,
-                        keepalive=True,
-                    )
-                else:
-                    logger.debug(
-                        "Found connection, testing. Timeout in {:d} seconds.".format(
-                            self.timeout - i
-                        )
-                    )
-                    connection.ping(timeout=1)
-                    logger.debug("Connection ok, returning.")
-                    logger.info("Connected.")
-                    return connection
-            except socket.error as e:
-                if self.python_popen.poll() is not None:
-                    raise RuntimeError(
-                        "Remote python {!s} failed on launch. ".format(self.python_exe)
-                        + "Does the remote python have rpyc installed?"
-                    )
-                if i == self.timeout - 1 or not e.errno == errno.ECONNREFUSED:
-                    raise RuntimeError(
-                        "Could not connect to remote python {!s}. ".format(
-                            self.python_exe
-                        )
-                        + "Does the remote python have rpyc installed?"
-                    )
-                sleep(1)
-            except (
-                rpyc.core.protocol.PingError,
-                rpyc.core.async_.AsyncResultTimeout,
-            ) as e:
-                logger.debug(str(e))
-                raise e
+        address = self.socket_path if self.transport == "unix" else self.port
+        logger.debug("Remote python listening on {!s}, connecting.".format(address))
+        try:
+            connection = _connect(self.transport, self.port, self.socket_path)
+            connection.ping(timeout=self.timeout)
+        except socket.error:
+            raise RuntimeError(
+                "Could not connect to remote python {!s}. ".format(self.python_exe)
+                + "Does the remote python have rpyc installed?"
+            )
+        except (
+            rpyc.core.protocol.PingError,
+            rpyc.core.async_.AsyncResultTimeout,
+        ) as e:
+            logger.debug(str(e))
+            raise e
+        logger.info("Connected.")
+        return connection
+
+    def _wait_for_server(self):
+        """Block until the remote announces on its stdout that it is listening, and
+        return the address that it announced."""
+        try:
+            address = self._announcements.get(timeout=self.timeout)
+        except queue.Empty:
+            raise RuntimeError(
+                "Remote python {!s} did not start listening in {!s} seconds.".format(
+                    self.python_exe, self.timeout
+                )
+            )
+        if address is None:
+            # Let the remote finish writing its error
+            self.output.join(1)
+            raise RuntimeError(
+                "Remote python {!s} failed on launch. ".format(self.python_exe)
+                + "Does the remote python have rpyc installed? Last output:\n"
+                + "\n".join(self.output.lines(20))
+            )
+        return address
 
     def _rebuild_py_remote(self):
         if self.retry < self.max_retry:
@@ -187,8 +568,11 @@ class GrasshopperToPythonRemote:
             [self.rhino_popen, self.connection, self.gh_remote] = [None, None, None]
             logger.info("Waiting 10 seconds.")
             sleep(10)
-            self.python_popen = self._launch_python()
+            self._start_python()
             self.connection = self._get_connection()
+            self.py_remote_modules = self.connection.root.getmodule
+            self._remote_run_block = None
+            self._function_handles = {}
         else:
             raise RuntimeError(
                 "Lost connection to Python, and reconnection attempts limit ({:d}) "
@@ -223,6 +607,15 @@ class PythonToGrasshopperRemote:
     max_retry : int
         Number of times Rhino will be restarted if it crashes, before declaring the
         connection dead.
+    shared_memory_threshold : int
+        Size in bytes from which deliver and obtain send payloads through a
+        memory-mapped file instead of the socket. None to always use the socket.
+    transport : str
+        "tcp" to connect through a localhost TCP port, or "unix" through a unix domain
+        socket, not available on Windows.
+    output_retention : int
+        Number of lines of the stdout and stderr of Rhino kept for remote_output. All
+        the lines are also forwarded to the "ghpythonremote.remote" logger.
     
     Examples
     --------
@@ -251,6 +644,9 @@ class PythonToGrasshopperRemote:
         max_retry=3,
         port=None,
         log_level=logging.WARNING,
+        shared_memory_threshold=None,
+        transport="tcp",
+        output_retention=remoteoutput.DEFAULT_RETENTION,
     ):
         if rhino_exe is None:
             self.rhino_exe = self._get_rhino_path(
@@ -263,15 +659,24 @@ class PythonToGrasshopperRemote:
         self.timeout = timeout
         self.retry = 0
         self.max_retry = max(0, max_retry)
-        if port is None:
-            self.port = _get_free_tcp_port()
+        self.transport = _check_transport(transport)
+        if self.transport == "unix":
+            self.port = None
+            self.socket_path = _get_socket_path()
         else:
-            self.port = port
+            self.port = _get_free_tcp_port() if port is None else port
+            self.socket_path = None
         self.log_level = log_level
+        self.shared_memory_threshold = shared_memory_threshold
+        self.output_retention = output_retention
         self.rhino_popen = self._launch_rhino()
         self.connection = self._get_connection()
         self.gh_remote_components = self.connection.root.ghcomp
         self.gh_remote_userobjects = self.connection.root.ghuo
+        # Remote component functions by (component_name, is_cluster), to look them up
+        # only once
+        self._component_handles = {}
+        self._remote_run_pipeline = None
 
     def __enter__(self):
         return self
@@ -302,18 +707,22 @@ class PythonToGrasshopperRemote:
     def run_gh_component(self, component_name, *nargs, **kwargs):
         """Run a specific Grasshopper component on the remote, with Rhino crash
         handling.
+
+        Inputs that are geometry value objects of geometrycodec, or lists of them, are
+        sent by value and rebuilt as RhinoCommon geometry in Rhino.
         """
         is_cluster = kwargs.pop("is_cluster", False)
-        # TODO: improve ghcomp to get clusters the same way we get compiled components,
-        # thus removing the need for a custom getter
-        component = self.gh_remote_components(component_name, is_cluster=is_cluster)
         component_output = kwargs.pop("component_output", None)
 
         try:
-            result = component(*nargs, **kwargs)
+            component = self._get_gh_component(component_name, is_cluster)
+            args, encoded_kwargs = _encode_inputs(nargs, kwargs)
+            result = component(*args, **encoded_kwargs)
         except (socket.error, EOFError):
             self._rebuild_gh_remote()
-            return self.run_gh_component(*nargs, **kwargs)
+            kwargs["is_cluster"] = is_cluster
+            kwargs["component_output"] = component_output
+            return self.run_gh_component(component_name, *nargs, **kwargs)
 
         if component_output is not None:
             try:
@@ -322,6 +731,192 @@ class PythonToGrasshopperRemote:
                 pass
         return result
 
+    def run_gh_component_async(self, component_name, *nargs, **kwargs):
+        """Send a call to a Grasshopper component on the remote, without waiting for
+        it.
+
+        Takes the same arguments as run_gh_component. Several calls sent in a row are
+        pipelined over the connection, instead of waiting for each round trip.
+
+        Returns
+        -------
+        RemoteFuture of the result. If Rhino crashes before the result arrives, the
+        call is run again with run_gh_component, that reconnects.
+        """
+        is_cluster = kwargs.pop("is_cluster", False)
+        component_output = kwargs.pop("component_output", None)
+
+        try:
+            component = self._get_gh_component(component_name, is_cluster)
+            args, encoded_kwargs = _encode_inputs(nargs, kwargs)
+            async_result = rpyc.async_(component)(*args, **encoded_kwargs)
+        except (socket.error, EOFError):
+            self._rebuild_gh_remote()
+            kwargs["is_cluster"] = is_cluster
+            kwargs["component_output"] = component_output
+            return self.run_gh_component_async(component_name, *nargs, **kwargs)
+
+        def retry():
+            return self.run_gh_component(
+                component_name,
+                *nargs,
+                is_cluster=is_cluster,
+                component_output=component_output,
+                **kwargs
+            )
+
+        return RemoteFuture(async_result, output=component_output, retry=retry)
+
+    def pipeline(self):
+        """Start a pipelines.Pipeline of components, that runs entirely in Rhino."""
+        return pipelines.Pipeline(self)
+
+    def run_pipeline(self, pipeline, *outputs):
+        """Run a pipeline of components in Rhino, in a single round trip, with Rhino
+        crash handling.
+
+        Intermediate results stay in Rhino, only the outputs asked for are sent back.
+
+        Parameters
+        ----------
+        pipeline : pipelines.Pipeline
+            Pipeline to run.
+        *outputs : pipelines.StepOutput
+            Outputs of steps of the pipeline to send back.
+
+        Returns
+        -------
+        Value of the only output, or tuple of the values of the outputs. Lists are
+        converted to tuples.
+        """
+        spec = pipeline.spec()
+        outputs_spec = pipeline.encode_outputs(outputs)
+        try:
+            if self._remote_run_pipeline is None:
+                self._remote_run_pipeline = self.connection.root.run_pipeline
+            values = self._remote_run_pipeline(spec, outputs_spec)
+        except (socket.error, EOFError):
+            self._rebuild_gh_remote()
+            return self.run_pipeline(pipeline, *outputs)
+        if len(values) == 1:
+            return values[0]
+        return values
+
+    def deliver(self, obj):
+        """Copy a local object to the remote, like ghpythonremote.deliver.
+
+        Payloads of at least shared_memory_threshold bytes go through shared memory
+        instead of the socket.
+
+        Returns
+        -------
+        Netref to the remote copy of obj. Values that brine sends by value, like str,
+        numbers or tuples, come back by value.
+        """
+        payload = sharedmem.dumps(obj, self.shared_memory_threshold)
+        return self.connection.modules["ghpythonremote.sharedmem"].loads(payload)
+
+    def obtain(self, remote_obj):
+        """Copy a remote object to the local, like ghpythonremote.obtain.
+
+        Payloads of at least shared_memory_threshold bytes go through shared memory
+        instead of the socket.
+        """
+        payload = self.connection.modules["ghpythonremote.sharedmem"].dumps(
+            remote_obj, self.shared_memory_threshold
+        )
+        return sharedmem.loads(payload)
+
+    def obtain_iter(
+        self,
+        remote_obj,
+        chunk_size=streaming.DEFAULT_CHUNK_SIZE,
+        prefetch=streaming.DEFAULT_PREFETCH,
+        as_numpy=True,
+    ):
+        """Copy a remote object to the local in chunks, as they arrive, see
+        GrasshopperToPythonRemote.obtain_iter."""
+        return streaming.obtain_iter(remote_obj, chunk_size, prefetch, as_numpy)
+
+    def obtain_geometry(self, remote_obj, as_numpy=False):
+        """Copy Rhino geometry, or a list of geometry, to lightweight value objects in
+        a single round trip, instead of reading its attributes through netrefs.
+
+        Parameters
+        ----------
+        remote_obj : netref
+            RhinoCommon geometry of a type that has a codec in geometrycodec, for
+            example Point3d, Plane, Polyline, Mesh or Curve, or a list of them.
+        as_numpy : bool
+            Return coordinates as numpy arrays instead of tuples of points.
+
+        Returns
+        -------
+        geometrycodec value objects, for example geometrycodec.Point3d, or tuples of
+        them for lists.
+        """
+        encoded = self.connection.root.encode_geometry(remote_obj)
+        return geometrycodec.decode(encoded, as_numpy)
+
+    def obtain_mesh(self, remote_mesh, normals=True, colors=True, as_numpy=True):
+        """Copy a Rhino mesh to arrays, in a single message.
+
+        The lists of the mesh are copied in bulk into typed buffers in Rhino, instead
+        of iterating its vertices and faces through netrefs, see meshbuffers.
+
+        Parameters
+        ----------
+        remote_mesh : netref
+            Rhino.Geometry.Mesh in Rhino.
+        normals, colors : bool
+            Copy the vertex normals, and the vertex colors.
+        as_numpy : bool
+            Return numpy arrays, otherwise flat array.array.
+
+        Returns
+        -------
+        meshbuffers.MeshBuffers: vertices (n, 3) float32, faces (m, 4) int32 with the
+        last two indices equal for triangles, normals (n, 3) float32 and colors (n, 4)
+        uint8 R, G, B, A, None when missing.
+        """
+        packed = self.connection.root.export_mesh(
+            remote_mesh, normals, colors, self.shared_memory_threshold
+        )
+        return meshbuffers.to_value(packed, as_numpy)
+
+    def deliver_mesh(self, vertices, faces, normals=None, colors=None):
+        """Build a Rhino mesh from arrays, sent in a single message.
+
+        Parameters
+        ----------
+        vertices, faces, normals, colors : array-like
+            See meshbuffers.from_value, for example the vertices and faces of a
+            trimesh.Trimesh. Normals are computed in Rhino if not given.
+
+        Returns
+        -------
+        Netref to the Rhino.Geometry.Mesh in Rhino.
+        """
+        packed = meshbuffers.from_value(
+            vertices, faces, normals, colors, self.shared_memory_threshold
+        )
+        return self.connection.root.import_mesh(*packed)
+
+    def trace(self, record_calls=True, max_records=10000):
+        """Count and record the requests sent to Rhino, to find chatty code.
+
+        Returns
+        -------
+        tracing.RPCTrace of the current connection, to use as a context manager. See
+        GrasshopperToPythonRemote.trace.
+        """
+        return tracing.RPCTrace(self.connection, record_calls, max_records)
+
+    def remote_output(self, n=None):
+        """Return the last n lines, or all the lines kept, that Rhino wrote to its
+        stdout and stderr, oldest first. See output_retention."""
+        return self.output.lines(n)
+
     def close(self):
         if not self.connection.closed:
             logger.info("Closing connection.")
@@ -329,6 +924,23 @@ class PythonToGrasshopperRemote:
         if self.rhino_popen.poll() is None:
             logger.info("Closing Rhino.")
             self.rhino_popen.terminate()
+        self.output.join(1)
+        _remove_socket_path(self.socket_path)
+
+    @property
+    def result_cache(self):
+        """Cache of the component results in Rhino, a resultcache.ResultCache."""
+        return self.connection.root.result_cache
+
+    def _get_gh_component(self, component_name, is_cluster=False):
+        key = (component_name, is_cluster)
+        try:
+            return self._component_handles[key]
+        except KeyError:
+            pass
+        component = self.connection.root.get_component(component_name, is_cluster)
+        self._component_handles[key] = component
+        return component
 
     @staticmethod
     def _get_rhino_path(version, preferred_bitness):
@@ -337,14 +949,15 @@ class PythonToGrasshopperRemote:
     def _launch_rhino(self):
         assert self.rhino_exe is not "" and self.rhino_exe is not None
         assert self.rpyc_server_py is not "" and self.rpyc_server_py is not None
-        assert self.port is not "" and self.port is not None
+        address = self.socket_path if self.transport == "unix" else self.port
+        assert address is not "" and address is not None
         if WINDOWS:
             rhino_call = [
                 '"' + self.rhino_exe + '"',
                 "/nosplash",
                 "/notemplate",
-                '/runscript="-_RunPythonScript ""{!s}"" {!s} {!s} -_Exit "'.format(
-                    self.rpyc_server_py, self.port, self.log_level,
+                '/runscript="-_RunPythonScript ""{!s}"" ""{!s}"" {!s} -_Exit "'.format(
+                    self.rpyc_server_py, address, self.log_level,
                 ),
             ]
         else:
@@ -352,8 +965,8 @@ class PythonToGrasshopperRemote:
                 self.rhino_exe,
                 "-nosplash",
                 "-notemplate",
-                '-runscript=-_RunPythonScript "{!s}" {!s} {!s} -_Exit'.format(
-                    self.rpyc_server_py, self.port, self.log_level,
+                '-runscript=-_RunPythonScript "{!s}" "{!s}" {!s} -_Exit'.format(
+                    self.rpyc_server_py, address, self.log_level,
                 ),
             ]
         if self.rhino_file_path:
@@ -363,31 +976,34 @@ class PythonToGrasshopperRemote:
             # manually convert to string
             rhino_call = " ".join(rhino_call)
         rhino_popen = subprocess.Popen(
-            rhino_call, stdout=subprocess.PIPE, stdin=subprocess.PIPE
+            rhino_call,
+            bufsize=-1,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.PIPE,
         )
+        # Read the output continuously, a full pipe would block Rhino
+        self.output = remoteoutput.OutputDrain(self.output_retention)
+        self.output.drain(rhino_popen.stdout, "stdout")
+        self.output.drain(rhino_popen.stderr, "stderr", log_level=logging.INFO)
         return rhino_popen
 
     def _get_connection(self):
         connection = None
         logger.info("Connecting...")
-        for i in range(self.timeout):
+        deadline = time() + self.timeout
+        while True:
+            remaining = max(0, deadline - time())
             try:
                 if not connection:
                     logger.debug(
-                        "Connecting. Timeout in {:d} seconds.".format(self.timeout - i)
-                    )
-                    connection = rpyc.utils.factory.connect(
-                        "localhost",
-                        self.port,
-                        service=rpyc.core.service.ClassicService,
-                        config={"sync_request_timeout": None},
-                        ipv6=False,
-                        keepalive=True,
+                        "Connecting. Timeout in {:.0f} seconds.".format(remaining)
                     )
+                    connection = _connect(self.transport, self.port, self.socket_path)
                 else:
                     logger.debug(
-                        "Found connection, testing. Timeout in {:d} seconds.".format(
-                            self.timeout - i
+                        "Found connection, testing. Timeout in {:.0f} seconds.".format(
+                            remaining
                         )
                     )
                     connection.ping(timeout=1)
@@ -399,12 +1015,12 @@ class PythonToGrasshopperRemote:
                 rpyc.core.protocol.PingError,
                 rpyc.core.async_.AsyncResultTimeout,
             ) as e:
-                if e is socket.error and not e.errno == errno.ECONNREFUSED:
+                if e is socket.error and e.errno not in NOT_READY_ERRNOS:
                     raise
-                if i == self.timeout - 1:
+                if remaining <= 0:
                     raise
                 elif e is socket.error or isinstance(e, socket.error):
-                    sleep(1)
+                    sleep(CONNECT_POLL_INTERVAL)
 
     def _rebuild_gh_remote(self):
         if self.retry < self.max_retry:
@@ -416,7 +1032,10 @@ class PythonToGrasshopperRemote:
             sleep(10)
             self.rhino_popen = self._launch_rhino()
             self.connection = self._get_connection()
-            self.gh_remote_components = self.connection.root.get_component
+            self.gh_remote_components = self.connection.root.ghcomp
+            self.gh_remote_userobjects = self.connection.root.ghuo
+            self._component_handles = {}
+            self._remote_run_pipeline = None
         else:
             raise RuntimeError(
                 "Lost connection to Rhino, and reconnection attempts limit ({:d}) "
@@ -424,6 +1043,175 @@ class PythonToGrasshopperRemote:
             )
 
 
+class RemoteFuture(object):
+    """Result of a remote call sent without waiting for its answer, with the same
+    interface as pools.Future.
+
+    Waiting for the result serves the connection until the answer arrives, so it must
+    happen in the thread that uses the connector.
+    """
+
+    def __init__(self, async_result, output=None, retry=None):
+        self._async_result = async_result
+        self._output = output
+        self._retry = retry
+        self._done = False
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        if self._done:
+            return True
+        try:
+            return self._async_result.ready
+        except (socket.error, EOFError):
+            # Lost the connection, result will retry
+            return True
+
+    def result(self, timeout=None):
+        """Wait for the call to finish, and return its result or raise its error."""
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Wait for the call to finish, and return its error, or None."""
+        if not self._done:
+            self._wait(timeout)
+        return self._exception
+
+    def _wait(self, timeout):
+        self._async_result.set_expiry(timeout)
+        try:
+            result = self._async_result.value
+            if self._output is not None:
+                try:
+                    result = result[self._output]
+                except NameError:
+                    pass
+        except rpyc.core.async_.AsyncResultTimeout:
+            raise RuntimeError("Result not ready after {!s} seconds.".format(timeout))
+        except (socket.error, EOFError) as e:
+            if self._retry is None:
+                self._exception = e
+            else:
+                logger.debug("Lost the connection while waiting, calling again.")
+                try:
+                    self._result = self._retry()
+                except Exception as e:
+                    self._exception = e
+        except Exception as e:
+            self._exception = e
+        else:
+            self._result = result
+        self._done = True
+
+
+def gather(*futures, **kwargs):
+    """Wait for all the futures, and return the list of their results, in order.
+
+    Parameters
+    ----------
+    *futures : RemoteFuture or pools.Future
+        Futures to wait for.
+    timeout : int
+        Number of seconds to wait for each future. By default, wait forever.
+    """
+    timeout = kwargs.pop("timeout", None)
+    return [future.result(timeout) for future in futures]
+
+
+class _SharedServer(object):
+    """Remote python in threaded server mode, and the number of connectors using it."""
+
+    def __init__(self, popen, output, port, socket_path):
+        self.popen = popen
+        self.output = output
+        self.port = port
+        self.socket_path = socket_path
+        self.n_users = 1
+
+
+def _release_shared_server(server):
+    """Stop a shared remote python when the last connector using it closes."""
+    with _shared_servers_lock:
+        server.n_users -= 1
+        if server.n_users > 0:
+            return
+        for key, value in list(_shared_servers.items()):
+            if value is server:
+                del _shared_servers[key]
+    if server.popen.poll() is None:
+        logger.info("Closing Python.")
+        server.popen.terminate()
+    server.output.join(1)
+    _remove_socket_path(server.socket_path)
+
+
+def _check_server_mode(server_mode):
+    if server_mode not in SERVER_MODES:
+        raise ValueError(
+            "Unknown server_mode {!s}, use one of {!s}.".format(
+                server_mode, ", ".join(SERVER_MODES)
+            )
+        )
+    return server_mode
+
+
+def _encode_inputs(nargs, kwargs):
+    """Encode the geometry value objects in the inputs of a component."""
+    args = [geometrycodec.encode_value(arg) for arg in nargs]
+    kwargs = dict((name, geometrycodec.encode_value(kwargs[name])) for name in kwargs)
+    return args, kwargs
+
+
+def _check_transport(transport):
+    if transport not in TRANSPORTS:
+        raise ValueError(
+            "Unknown transport {!s}, use one of {!s}.".format(
+                transport, ", ".join(TRANSPORTS)
+            )
+        )
+    if transport == "unix" and not hasattr(socket, "AF_UNIX"):
+        raise ValueError("Unix domain sockets are not available on this platform.")
+    return transport
+
+
+def _connect(transport, port, socket_path):
+    if transport == "unix":
+        return rpyc.utils.factory.unix_connect(
+            socket_path,
+            service=rpyc.core.service.ClassicService,
+            config={"sync_request_timeout": None},
+        )
+    # Without Nagle's algorithm, pipelined async requests are not held back waiting
+    # for the acknowledgment of the previous one
+    stream = rpyc.core.stream.SocketStream.connect(
+        "localhost", port, ipv6=False, keepalive=True, nodelay=True
+    )
+    return rpyc.utils.factory.connect_stream(
+        stream,
+        service=rpyc.core.service.ClassicService,
+        config={"sync_request_timeout": None},
+    )
+
+
+def _get_socket_path():
+    # Keep it short, unix socket paths are limited to about 100 characters
+    return os.path.join(
+        tempfile.gettempdir(), "ghpythonremote-{!s}.sock".format(uuid.uuid4().hex[:12])
+    )
+
+
+def _remove_socket_path(socket_path):
+    if socket_path is not None and os.path.exists(socket_path):
+        try:
+            os.remove(socket_path)
+        except OSError:
+            logger.debug("Could not remove socket file {!s}.".format(socket_path))
+
+
 def _get_free_tcp_port():
     tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     tcp.bind(("", 0))
@@ -0,0 +1,130 @@
+"""DataTree marshaling.
+
+A tree crosses the connection as a plain tuple (paths, counts, dtype, values):
+    paths: tuple of the paths of the branches, each a tuple of ints;
+    counts: tuple of the number of items of each branch;
+    dtype: None if values is a tuple of items, or the name of the type of the items,
+        from arrays.TYPECODES, if values is a typed buffer;
+    values: the items of all the branches, one branch after the other.
+brine encodes it in a single message, and numbers as a single buffer. This module is
+imported on both sides of the connection: only from_structure and set_volatile_data
+need Grasshopper.
+"""
+import logging
+from collections import OrderedDict
+
+from . import arrays
+
+logger = logging.getLogger("ghpythonremote.datatrees")
+
+# Range of the values packed as int32
+INT32_MIN = -(2 ** 31)
+INT32_MAX = 2 ** 31 - 1
+
+
+def _normalize_path(path):
+    if isinstance(path, (int, long)):
+        return (int(path),)
+    return tuple(int(index) for index in path)
+
+
+def pack(branches, dtype=None):
+    """Pack branches of items into a tree.
+
+    Parameters
+    ----------
+    branches : dict or list
+        Lists of items by path, a path being a tuple of ints. Paths of a dict are
+        sorted, use an OrderedDict to keep another order. A list or a tuple of items is
+        packed as a single branch with path (0,).
+    dtype : str
+        Pack the items in a typed buffer of that type, from arrays.TYPECODES. By
+        default, the items are packed in a tuple.
+
+    Returns
+    -------
+    (paths, counts, dtype, values), to be unpacked with unpack, or given as input of the
+    tree method of a ghuserobjects function.
+    """
+    if isinstance(branches, OrderedDict):
+        branches = list(branches.items())
+    elif isinstance(branches, dict):
+        branches = sorted(branches.items())
+    else:
+        branches = [((0,), branches)]
+    paths = []
+    counts = []
+    flat = []
+    for path, items in branches:
+        items = list(items)
+        paths.append(_normalize_path(path))
+        counts.append(len(items))
+        flat.extend(items)
+    if dtype is None:
+        values = tuple(flat)
+    else:
+        dtype, _, values = arrays.pack(flat, dtype=dtype)
+    return tuple(paths), tuple(counts), dtype, values
+
+
+def unpack(tree):
+    """Unpack a tree into an OrderedDict of the lists of items, by path."""
+    paths, counts, dtype, values = tree
+    if dtype is not None:
+        values = arrays.unpack(dtype, (sum(counts),), values, flat=True).tolist()
+    branches = OrderedDict()
+    start = 0
+    for path, count in zip(paths, counts):
+        branches[tuple(path)] = list(values[start : start + count])
+        start += count
+    return branches
+
+
+def _infer_dtype(values):
+    if not values:
+        return None
+    if all(type(value) is float for value in values):
+        return "float64"
+    if all(
+        type(value) is int and INT32_MIN <= value <= INT32_MAX for value in values
+    ):
+        return "int32"
+    return None
+
+
+def from_structure(structure):
+    """Pack the data of a Grasshopper IGH_Structure, for example the VolatileData of a
+    parameter, keeping its branches.
+
+    Items are converted with ScriptVariable, and packed in a typed buffer if they are
+    all floats or all integers.
+    """
+    paths = []
+    counts = []
+    flat = []
+    for path in structure.Paths:
+        branch = structure.get_Branch(path)
+        paths.append(tuple(path.Indices))
+        counts.append(branch.Count)
+        for goo in branch:
+            flat.append(None if goo is None else goo.ScriptVariable())
+    dtype = _infer_dtype(flat)
+    if dtype is None:
+        values = tuple(flat)
+    else:
+        dtype, _, values = arrays.pack(flat, dtype=dtype)
+    return tuple(paths), tuple(counts), dtype, values
+
+
+def set_volatile_data(param, tree):
+    """Replace the volatile data of a Grasshopper parameter with the branches of a
+    tree. For a component input, call it after CollectData, that overwrites the
+    volatile data with the persistent data."""
+    import System
+    import Grasshopper as gh
+
+    param.ClearData()
+    for path, items in unpack(tree).items():
+        param.AddVolatileDataList(
+            gh.Kernel.Data.GH_Path(System.Array[int](path)), items
+        )
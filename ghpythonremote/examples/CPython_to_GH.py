@@ -54,6 +54,10 @@ if __name__ == "__main__":
         gh_curves = rs.coerceguidlist(curves_id)
         # Call a GH component
         print(sum(rghcomp.Area(gh_curves)[0]))
+        # Copy geometry by value in one round trip, instead of reading each coordinate
+        # through the connection
+        centroids = py2gh.obtain_geometry(rghcomp.Area(gh_curves)[1])
+        print(centroids[0].x)
         # Call a GH user object, previously created with the name "TestClusterGHPythonRemote"
         # returns x^2 + y + 2
         print(rghuo.TestClusterGHPythonRemote(3, y=4))  # = 15
@@ -7,7 +7,7 @@ from time import sleep
 import scriptcontext
 
 import ghpythonremote
-from ghpythonremote.connectors import GrasshopperToPythonRemote
+from ghpythonremote.pools import WarmPythonPool
 from Grasshopper.Kernel.GH_RuntimeMessageLevel import Error, Warning
 
 local_log_level = getattr(logging, log_level, logging.WARNING)
@@ -57,14 +57,28 @@ while remote_python_status == "CONNECTING" or remote_python_status == "CLOSING":
 if run:
     if not remote_python_status == "OPEN":
         remote_python_status = "CONNECTING"
-        gh2py_manager = GrasshopperToPythonRemote(
-            rpyc_server_py,
-            location=location,
-            timeout=10,
-            port=None,
-            log_level=log_level,
-            working_dir=working_dir,
-        )
+        # Keep a remote python launched in advance, with the modules imported, so that
+        # the next connection is immediate
+        pool_key = (location, log_level, working_dir, tuple(modules))
+        try:
+            old_pool_key, pool = scriptcontext.sticky["ghpythonremote_pool"]
+        except KeyError:
+            old_pool_key, pool = None, None
+        if pool is None or old_pool_key != pool_key:
+            if pool is not None:
+                pool.close()
+            pool = WarmPythonPool(
+                rpyc_server_py,
+                size=1,
+                modules=modules,
+                location=location,
+                timeout=10,
+                port=None,
+                log_level=log_level,
+                working_dir=working_dir,
+            )
+            scriptcontext.sticky["ghpythonremote_pool"] = (pool_key, pool)
+        gh2py_manager = pool.acquire()
         gh2py = gh2py_manager.__enter__()
         remote_python_status = "OPEN"
 
@@ -72,6 +86,7 @@ if run:
     rpymod = gh2py.py_remote_modules  # A getter function for a named python module
     rpy = gh2py.connection  # Represents the remote instance root object
     scriptcontext.sticky["rpy"] = rpy
+    scriptcontext.sticky["gh2py"] = gh2py
     # Add modules
     for mod in modules:
         try:
@@ -99,6 +114,7 @@ elif not remote_python_status == "CLOSED":
     for mod in lkd_modules:
         del scriptcontext.sticky[mod]
     del scriptcontext.sticky["rpy"]
+    del scriptcontext.sticky["gh2py"]
     gh2py_manager.__exit__(*sys.exc_info())
     lkd_modules = set()
     remote_python_status = "CLOSED"
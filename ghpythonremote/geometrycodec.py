@@ -0,0 +1,452 @@
+"""Compact binary codec for Rhino geometry crossing the connection.
+
+Rhino geometry normally crosses as netrefs, so reading the coordinates of 100k points
+takes 300k round trips. A codec packs a kind of geometry into a plain tuple, with its
+coordinates in typed buffers from the arrays module, that brine sends in a single
+message:
+    (TAG, name, data), name being the name of the codec.
+Rhino sends geometry encoded with encode, that CPython decodes into lightweight value
+objects, or numpy arrays, with decode. The other way, CPython encodes value objects
+with encode_value, and Rhino rebuilds RhinoCommon geometry with to_rhino.
+
+This module is imported on both sides of the connection: only encode and to_rhino
+need RhinoCommon. Add codecs for more types with register.
+"""
+import logging
+from collections import namedtuple
+
+from . import arrays, meshbuffers
+
+logger = logging.getLogger("ghpythonremote.geometrycodec")
+
+# First item of an encoded geometry
+TAG = "ghpythonremote.geometry"
+
+# Value objects, built on the CPython side
+Point3d = namedtuple("Point3d", ["x", "y", "z"])
+Vector3d = namedtuple("Vector3d", ["x", "y", "z"])
+Plane = namedtuple("Plane", ["origin", "xaxis", "yaxis"])
+Line = namedtuple("Line", ["start", "end"])
+Polyline = namedtuple("Polyline", ["points"])
+Mesh = namedtuple("Mesh", ["vertices", "faces"])
+NurbsCurve = namedtuple("NurbsCurve", ["degree", "points", "weights", "knots"])
+
+
+class Codec(object):
+    """How one kind of geometry crosses the connection.
+
+    Parameters
+    ----------
+    name : str
+        Name of the codec, sent with the encoded geometry.
+    rhino_types : iterable of str
+        Full names of the RhinoCommon types that the codec encodes, subclasses
+        included.
+    value_type : type
+        Type of the value objects that the codec encodes, or None.
+    from_rhino : callable
+        In Rhino, data of a RhinoCommon object. data must only contain primitives,
+        tuples, and typed buffers.
+    to_rhino : callable
+        In Rhino, RhinoCommon object built from data.
+    from_value : callable
+        In CPython, data of a value object.
+    to_value : callable
+        In CPython, value object built from data, and as_numpy to build numpy arrays
+        instead of tuples of points.
+    """
+
+    def __init__(
+        self, name, rhino_types, value_type, from_rhino, to_rhino, from_value, to_value
+    ):
+        self.name = name
+        self.rhino_types = tuple(rhino_types)
+        self.value_type = value_type
+        self.from_rhino = from_rhino
+        self.to_rhino = to_rhino
+        self.from_value = from_value
+        self.to_value = to_value
+
+
+_codecs = {}
+_codecs_by_rhino_type = {}
+_codecs_by_value_type = {}
+
+
+def register(codec):
+    """Register a codec, replacing the codec with the same name or types."""
+    _codecs[codec.name] = codec
+    for rhino_type in codec.rhino_types:
+        _codecs_by_rhino_type[rhino_type] = codec
+    if codec.value_type is not None:
+        _codecs_by_value_type[codec.value_type] = codec
+
+
+def is_encoded(value):
+    return type(value) is tuple and len(value) == 3 and value[0] == TAG
+
+
+def encode(obj):
+    """In Rhino, encode RhinoCommon geometry, or a list of geometry.
+
+    Lists of points are packed in a single buffer.
+
+    Raises
+    ------
+    TypeError if there is no codec for obj.
+    """
+    codec = _find_rhino_codec(obj)
+    if codec is not None:
+        return TAG, codec.name, codec.from_rhino(obj)
+    if _is_list(obj):
+        items = list(obj)
+        if items and all(_is_point(item) for item in items):
+            return TAG, "Point3dList", _pack_rhino_points(items)
+        return tuple(encode(item) for item in items)
+    raise TypeError("No geometry codec for {!s}.".format(type(obj).__name__))
+
+
+def decode(encoded, as_numpy=False):
+    """In CPython, build value objects from encoded geometry.
+
+    Parameters
+    ----------
+    encoded : tuple
+        Result of encode.
+    as_numpy : bool
+        Return coordinates as numpy arrays, of shape (n, 3) for points, instead of
+        tuples of value objects.
+    """
+    if is_encoded(encoded):
+        return _get_codec(encoded[1]).to_value(encoded[2], as_numpy)
+    if type(encoded) is tuple:
+        return tuple(decode(item, as_numpy) for item in encoded)
+    return encoded
+
+
+def encode_value(value):
+    """In CPython, encode a value object, or a list or tuple of them. Other values are
+    returned unchanged."""
+    codec = _codecs_by_value_type.get(type(value))
+    if codec is not None:
+        return TAG, codec.name, codec.from_value(value)
+    if type(value) in (list, tuple) and value:
+        if all(type(item) is Point3d for item in value):
+            return TAG, "Point3dList", _pack_points(value)
+        items = [encode_value(item) for item in value]
+        if any(item is not original for item, original in zip(items, value)):
+            # A tuple, sent by value with its encoded items
+            return tuple(items)
+    return value
+
+
+def to_rhino(value):
+    """In Rhino, build RhinoCommon geometry from encoded geometry, or a tuple with
+    encoded geometry in it. Other values are returned unchanged."""
+    if is_encoded(value):
+        return _get_codec(value[1]).to_rhino(value[2])
+    if type(value) is tuple and any(is_encoded(item) for item in value):
+        return [to_rhino(item) for item in value]
+    return value
+
+
+def decoding(function):
+    """In Rhino, wrap a component function to build RhinoCommon geometry from its
+    encoded inputs."""
+
+    def decoding_function(*args, **kwargs):
+        args = [to_rhino(arg) for arg in args]
+        kwargs = dict((name, to_rhino(value)) for name, value in kwargs.items())
+        return function(*args, **kwargs)
+
+    decoding_function.__name__ = getattr(function, "__name__", "decoding_function")
+    decoding_function.__doc__ = getattr(function, "__doc__", None)
+    return decoding_function
+
+
+def _get_codec(name):
+    try:
+        return _codecs[name]
+    except KeyError:
+        raise TypeError("No geometry codec named {!s}.".format(name))
+
+
+def _find_rhino_codec(obj):
+    get_type = getattr(obj, "GetType", None)
+    if get_type is None:
+        return None
+    net_type = get_type()
+    while net_type is not None:
+        codec = _codecs_by_rhino_type.get(net_type.FullName)
+        if codec is not None:
+            return codec
+        net_type = net_type.BaseType
+    return None
+
+
+def _is_list(obj):
+    if isinstance(obj, (list, tuple)):
+        return True
+    if isinstance(obj, basestring):
+        return False
+    try:
+        import System
+    except ImportError:
+        return False
+    return isinstance(obj, System.Collections.IEnumerable)
+
+
+def _is_point(obj):
+    get_type = getattr(obj, "GetType", None)
+    return get_type is not None and get_type().FullName in (
+        "Rhino.Geometry.Point3d",
+        "Rhino.Geometry.Point3f",
+    )
+
+
+# Packing of points, shared by the codecs
+
+
+def _pack_rhino_points(points):
+    flat = []
+    for point in points:
+        flat.extend((point.X, point.Y, point.Z))
+    return arrays.pack(flat, "float64", (len(flat) // 3, 3))
+
+
+def _unpack_rhino_points(packed):
+    import Rhino.Geometry as rg
+
+    flat = arrays.unpack(*packed, flat=True)
+    return [rg.Point3d(flat[i], flat[i + 1], flat[i + 2]) for i in range(0, len(flat), 3)]
+
+
+def _pack_points(points, dtype="float64"):
+    if hasattr(points, "dtype"):
+        return arrays.from_ndarray(points, dtype=dtype)
+    return arrays.pack([tuple(point) for point in points], dtype, (len(points), 3))
+
+
+def _unpack_points(packed, as_numpy):
+    if as_numpy:
+        return arrays.to_ndarray(*packed)
+    flat = arrays.unpack(*packed, flat=True)
+    return tuple(
+        Point3d(flat[i], flat[i + 1], flat[i + 2]) for i in range(0, len(flat), 3)
+    )
+
+
+# Codecs of the common RhinoCommon types
+
+
+def _xyz(point):
+    return point.X, point.Y, point.Z
+
+
+def _rhino_point(data):
+    import Rhino.Geometry as rg
+
+    return rg.Point3d(*data)
+
+
+def _rhino_vector(data):
+    import Rhino.Geometry as rg
+
+    return rg.Vector3d(*data)
+
+
+def _rhino_plane(data):
+    import Rhino.Geometry as rg
+
+    return rg.Plane(
+        rg.Point3d(*data[0:3]), rg.Vector3d(*data[3:6]), rg.Vector3d(*data[6:9])
+    )
+
+
+def _rhino_line(data):
+    import Rhino.Geometry as rg
+
+    return rg.Line(rg.Point3d(*data[0:3]), rg.Point3d(*data[3:6]))
+
+
+def _rhino_polyline(data):
+    import Rhino.Geometry as rg
+
+    return rg.Polyline(_unpack_rhino_points(data))
+
+
+def _mesh_from_rhino(mesh):
+    # Single precision vertices, as stored by the mesh, copied in bulk
+    return meshbuffers.export_mesh(mesh, normals=False, colors=False)[:2]
+
+
+def _rhino_mesh(data):
+    vertices, faces = data
+    return meshbuffers.import_mesh(vertices, faces)
+
+
+def _mesh_from_value(mesh):
+    return _pack_points(mesh.vertices, "float32"), meshbuffers.pack_faces(mesh.faces)
+
+
+def _mesh_value(data, as_numpy):
+    vertices, faces = data
+    if as_numpy:
+        return Mesh(_unpack_points(vertices, True), arrays.to_ndarray(*faces))
+    return Mesh(
+        _unpack_points(vertices, False),
+        tuple(tuple(face) for face in arrays.unpack(*faces)),
+    )
+
+
+def _nurbs_from_rhino(curve):
+    if curve.GetType().FullName != "Rhino.Geometry.NurbsCurve":
+        curve = curve.ToNurbsCurve()
+    points = []
+    for control_point in curve.Points:
+        location = control_point.Location
+        points.extend((location.X, location.Y, location.Z, control_point.Weight))
+    knots = [curve.Knots[i] for i in range(curve.Knots.Count)]
+    return (
+        curve.Degree,
+        arrays.pack(points, "float64", (len(points) // 4, 4)),
+        arrays.pack(knots, "float64"),
+    )
+
+
+def _rhino_nurbs(data):
+    import Rhino.Geometry as rg
+
+    degree, points, knots = data
+    points = arrays.unpack(*points, flat=True)
+    n_points = len(points) // 4
+    weights = [points[4 * i + 3] for i in range(n_points)]
+    is_rational = any(weight != 1.0 for weight in weights)
+    curve = rg.NurbsCurve(3, is_rational, degree + 1, n_points)
+    for i in range(n_points):
+        x, y, z, weight = points[4 * i : 4 * i + 4]
+        curve.Points.SetPoint(i, rg.Point3d(x, y, z), weight)
+    for i, knot in enumerate(arrays.unpack(*knots, flat=True)):
+        curve.Knots[i] = knot
+    return curve
+
+
+def _nurbs_from_value(curve):
+    if hasattr(curve.points, "dtype"):
+        import numpy
+
+        points = numpy.column_stack([curve.points, curve.weights])
+        points = arrays.from_ndarray(points, dtype="float64")
+    else:
+        points = arrays.pack(
+            [tuple(point) + (weight,) for point, weight in zip(curve.points, curve.weights)],
+            "float64",
+            (len(curve.points), 4),
+        )
+    return int(curve.degree), points, arrays.pack(list(curve.knots), "float64")
+
+
+def _nurbs_value(data, as_numpy):
+    degree, points, knots = data
+    if as_numpy:
+        points = arrays.to_ndarray(*points)
+        return NurbsCurve(degree, points[:, :3], points[:, 3], arrays.to_ndarray(*knots))
+    flat = arrays.unpack(*points, flat=True)
+    return NurbsCurve(
+        degree,
+        tuple(Point3d(*flat[i : i + 3]) for i in range(0, len(flat), 4)),
+        tuple(flat[3::4]),
+        tuple(arrays.unpack(*knots, flat=True)),
+    )
+
+
+register(
+    Codec(
+        "Point3d",
+        ["Rhino.Geometry.Point3d", "Rhino.Geometry.Point3f"],
+        Point3d,
+        _xyz,
+        _rhino_point,
+        lambda point: tuple(float(x) for x in point),
+        lambda data, as_numpy: Point3d(*data),
+    )
+)
+register(
+    Codec(
+        "Vector3d",
+        ["Rhino.Geometry.Vector3d", "Rhino.Geometry.Vector3f"],
+        Vector3d,
+        _xyz,
+        _rhino_vector,
+        lambda vector: tuple(float(x) for x in vector),
+        lambda data, as_numpy: Vector3d(*data),
+    )
+)
+register(
+    Codec(
+        "Plane",
+        ["Rhino.Geometry.Plane"],
+        Plane,
+        lambda plane: _xyz(plane.Origin) + _xyz(plane.XAxis) + _xyz(plane.YAxis),
+        _rhino_plane,
+        lambda plane: tuple(float(x) for x in plane.origin + plane.xaxis + plane.yaxis),
+        lambda data, as_numpy: Plane(
+            Point3d(*data[0:3]), Vector3d(*data[3:6]), Vector3d(*data[6:9])
+        ),
+    )
+)
+register(
+    Codec(
+        "Line",
+        ["Rhino.Geometry.Line"],
+        Line,
+        lambda line: _xyz(line.From) + _xyz(line.To),
+        _rhino_line,
+        lambda line: tuple(float(x) for x in tuple(line.start) + tuple(line.end)),
+        lambda data, as_numpy: Line(Point3d(*data[0:3]), Point3d(*data[3:6])),
+    )
+)
+register(
+    Codec(
+        "Polyline",
+        ["Rhino.Geometry.Polyline"],
+        Polyline,
+        _pack_rhino_points,
+        _rhino_polyline,
+        lambda polyline: _pack_points(polyline.points),
+        lambda data, as_numpy: Polyline(_unpack_points(data, as_numpy)),
+    )
+)
+register(
+    Codec(
+        "Point3dList",
+        [],
+        None,
+        _pack_rhino_points,
+        _unpack_rhino_points,
+        _pack_points,
+        _unpack_points,
+    )
+)
+register(
+    Codec(
+        "Mesh",
+        ["Rhino.Geometry.Mesh"],
+        Mesh,
+        _mesh_from_rhino,
+        _rhino_mesh,
+        _mesh_from_value,
+        _mesh_value,
+    )
+)
+register(
+    Codec(
+        "NurbsCurve",
+        ["Rhino.Geometry.NurbsCurve", "Rhino.Geometry.Curve"],
+        NurbsCurve,
+        _nurbs_from_rhino,
+        _rhino_nurbs,
+        _nurbs_from_value,
+        _nurbs_value,
+    )
+)
@@ -1,29 +1,81 @@
 import logging
+import os
 import sys
 
-from ghpythonremote import rpyc
+from ghpythonremote import geometrycodec, meshbuffers, pipelines, resultcache, rpyc
+from ghpythonremote.pythonservice import NoDelayServerMixin
 from rpyc.utils.server import OneShotServer
 
 
+class NoDelayOneShotServer(NoDelayServerMixin, OneShotServer):
+    """OneShotServer that answers pipelined requests without delay."""
+
+
 class GhcompService(rpyc.ClassicService):
     def on_connect(self, conn):
         print("Incoming connection.")
         super(GhcompService, self).on_connect(conn)
         import ghpythonlib.components as ghcomp
-        from ghpythonremote import ghuserobjects as ghuo
+        import ghpythonremote.ghuserobjects
 
         self.ghcomp = ghcomp
-        self.ghuo = ghuo
+        # ghuserobjects replaces itself in sys.modules with a module that creates the
+        # user object functions lazily
+        self.ghuo = sys.modules["ghpythonremote.ghuserobjects"]
+        self.result_cache = resultcache.cache
 
     def on_disconnect(self, conn):
         print("Disconnected.")
+        self.ghuo.release_all()
+
+    def get_component(self, component_name, is_cluster=False):
+        """Get the function of a Grasshopper component, that goes through the result
+        cache, and rebuilds the geometry encoded by geometrycodec in its inputs.
+
+        Compiled components come from ghpythonlib.components, clusters and other user
+        objects from ghuserobjects, that caches their results itself. Plugin
+        components can be in sub-namespaces, for example "Kangaroo2Component.Solver".
+        """
+        if is_cluster:
+            component = self.ghuo
+        else:
+            component = self.ghcomp
+        for name in component_name.split("."):
+            component = getattr(component, name)
+        component = geometrycodec.decoding(component)
+        if is_cluster:
+            return component
+        # The cache key is computed on the encoded inputs, cheaper to hash
+        return resultcache.cached(component_name, component)
+
+    def encode_geometry(self, obj):
+        """Encode geometry with geometrycodec, to send it by value."""
+        return geometrycodec.encode(obj)
+
+    def export_mesh(self, mesh, normals=True, colors=True, threshold=None):
+        """Copy the lists of a mesh into typed buffers, see meshbuffers.export_mesh."""
+        return meshbuffers.export_mesh(mesh, normals, colors, threshold)
+
+    def import_mesh(self, vertices, faces, normals=None, colors=None):
+        """Build a mesh from typed buffers, see meshbuffers.import_mesh."""
+        return meshbuffers.import_mesh(vertices, faces, normals, colors)
+
+    def run_pipeline(self, steps, outputs):
+        """Run a pipeline of components, and return only the outputs asked for. See
+        pipelines.execute."""
+        return pipelines.execute(steps, outputs, self.get_component)
 
 
 if __name__ == "__main__":
     import rhinoscriptsyntax as rs
 
-    port = rs.GetInteger("Server bind port", 18871, 1023, 65535)
+    # The address is either a TCP port number, or the path of a unix domain socket
+    address = rs.GetString("Server bind port or socket path", "18871")
     log_level = rs.GetInteger("Log level as int", 30, 0, 100)
+    try:
+        port, socket_path = int(address), None
+    except (TypeError, ValueError):
+        port, socket_path = None, address
 
     logger = logging.getLogger()
     logger.setLevel(log_level)
@@ -38,7 +90,16 @@ if __name__ == "__main__":
     logger = logging.getLogger("ghpythonremote.ghcompservice")
     logger.info("Starting server...")
 
-    server = OneShotServer(
-        GhcompService, hostname="localhost", port=port, listener_timeout=None
-    )
-    server.start()
+    if socket_path is None:
+        server = NoDelayOneShotServer(
+            GhcompService, hostname="localhost", port=port, listener_timeout=None
+        )
+    else:
+        server = NoDelayOneShotServer(
+            GhcompService, socket_path=socket_path, listener_timeout=None
+        )
+    try:
+        server.start()
+    finally:
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
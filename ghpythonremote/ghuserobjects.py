@@ -27,65 +27,227 @@ import Rhino
 import Grasshopper as gh
 import sys
 import re
+import types
+
+from ghpythonremote import datatrees, resultcache
 
 
 class namespace_object(object):
     pass
 
 
+def __set_input_uo__(param, arg):
+    param.PersistentData.Clear()
+    if hasattr(arg, '__iter__'):  # TODO deal with polyline, str
+        [param.AddPersistentData(a) for a in arg]
+    else:
+        param.AddPersistentData(arg)
+
+
 def __make_function_uo__(helper):
     def component_function(*args, **kwargs):
-        comp = helper.proxy.CreateInstance()
+        return resultcache.cache.call(helper.name, compute, args, kwargs)
+
+    def compute(*args, **kwargs):
+        instance = helper.acquire()
+        comp = instance[0]
+        try:
+            comp.ClearData()
+            changed = helper.set_inputs(comp, args, kwargs)
+            comp.CollectData()
+            comp.ComputeData()
+            output = helper.create_output(comp.Params)
+        except:
+            helper.dispose(instance)
+            raise
+        helper.recycle(instance, changed)
+        return output
+
+    def batch(*columns, **kwcolumns):
+        """Evaluate the user object over many sets of inputs, in a single call.
+
+        Each argument is a column of inputs, one value per evaluation, by position or
+        by name like the arguments of the function. A None value keeps the default of
+        that input for that evaluation. From CPython, pass the columns as tuples, so
+        that they are sent in one message.
+
+        Returns a tuple with one column of results per output, or the column of the
+        only output. Each column is a tuple with one value per evaluation.
+        """
+        lengths = set(len(column) for column in columns)
+        lengths.update(len(column) for column in kwcolumns.values())
+        if len(lengths) > 1:
+            raise ValueError("All the columns of inputs must have the same length.")
+        n_rows = lengths.pop() if lengths else 0
+        instance = helper.acquire(snapshot=True)
+        comp = instance[0]
+        n_outputs = comp.Params.Output.Count
+        rows = []
+        changed = []
+        try:
+            for row in range(n_rows):
+                comp.ClearData()
+                args = [column[row] for column in columns]
+                kwargs = dict(
+                    (name, column[row])
+                    for name, column in kwcolumns.items()
+                    if column[row] is not None)
+                changed = helper.set_inputs(comp, args, kwargs)
+                comp.CollectData()
+                comp.ComputeData()
+                rows.append(helper.get_output_values(comp.Params))
+                helper.reset_inputs(instance, changed)
+                changed = []
+        except:
+            helper.dispose(instance)
+            raise
+        helper.recycle(instance, changed)
+        # Plain tuples, that rpyc sends by value instead of as netrefs
+        outputs = tuple(
+            tuple(tuple(v) if isinstance(v, list) else v for v in output)
+            for output in zip(*rows))
+        if not outputs:
+            outputs = ((),) * n_outputs
+        if len(outputs) == 1: return outputs[0]
+        return outputs
+
+    def tree(*args, **kwargs):
+        """Call the user object with DataTree inputs and outputs.
+
+        Each argument is a tree packed with datatrees.pack, by position or by name like
+        the arguments of the function. A None argument keeps the default of that
+        input. The branches and numbers are converted in one pass, instead of item by
+        item.
+
+        Returns a tree per output, that datatrees.unpack unpacks, or the tree of the
+        only output.
+        """
+        instance = helper.acquire()
+        comp = instance[0]
+        try:
+            comp.ClearData()
+            comp.CollectData()
+            for i, arg in helper.get_inputs(comp, args, kwargs):
+                if arg is None: continue
+                datatrees.set_volatile_data(comp.Params.Input[i], arg)
+            comp.ComputeData()
+            outputs = tuple(
+                datatrees.from_structure(output.VolatileData)
+                for output in comp.Params.Output)
+        except:
+            helper.dispose(instance)
+            raise
+        helper.recycle(instance, [])
+        if len(outputs) == 1: return outputs[0]
+        return outputs
+
+    component_function.batch = batch
+    component_function.tree = tree
+    component_function.set_pool_size = helper.set_pool_size
+    component_function.release = helper.release
+    return component_function
+
+
+class function_helper(object):
+    def __init__(self, proxy, name, pool_size=0):
+        self.proxy = proxy
+        self.name = name
+        self.return_type = None
+        self.pool_size = pool_size
+        self.pool = []
+
+    def acquire(self, snapshot=False):
+        """Get an idle (component, document, defaults) instance from the pool, or
+        create one. defaults is only kept if the instance can go back to the pool, or
+        if snapshot is True."""
+        if self.pool:
+            return self.pool.pop()
+        comp = self.proxy.CreateInstance()
+        doc = gh.Kernel.GH_Document()
+        doc.AddObject(comp, False, 0)
+        if snapshot or self.pool_size > 0:
+            # Persistent data of a new instance, to reset the inputs between calls
+            defaults = [param.PersistentData.Duplicate() for param in comp.Params.Input]
+        else:
+            defaults = None
+        return comp, doc, defaults
+
+    def recycle(self, instance, changed):
+        """Put an instance back in the pool after a call, with the inputs it changed
+        reset, or dispose it if the pool is full."""
+        comp, doc, defaults = instance
         comp.ClearData()
+        if defaults is None or len(self.pool) >= self.pool_size:
+            doc.Dispose()
+            return
+        self.reset_inputs(instance, changed)
+        self.pool.append(instance)
+
+    def get_inputs(self, comp, args, kwargs):
+        """List the (index, value) of the inputs given by position, except None, or by
+        name."""
+        inputs = []
         if args:
             for i, arg in enumerate(args):
                 if arg is None: continue
-                param = comp.Params.Input[i]
-                param.PersistentData.Clear()
-                if hasattr(arg, '__iter__'):  # TODO deal with polyline, str
-                    [param.AddPersistentData(a) for a in arg]
-                else:
-                    param.AddPersistentData(arg)
+                inputs.append((i, arg))
         if kwargs:
-            for param in comp.Params.Input:
+            for i, param in enumerate(comp.Params.Input):
                 name = param.Name.lower()
                 if name in kwargs:
-                    param.PersistentData.Clear()
-                    arg = kwargs[name]
-                    if hasattr(arg, '__iter__'):  # TODO deal with polyline, str
-                        [param.AddPersistentData(a) for a in arg]
-                    else:
-                        param.AddPersistentData(arg)
-        doc = gh.Kernel.GH_Document()
-        doc.AddObject(comp, False, 0)
-        comp.CollectData()
-        comp.ComputeData()
-        output = helper.create_output(comp.Params)
-        comp.ClearData()
-        doc.Dispose()
-        return output
+                    inputs.append((i, kwargs[name]))
+        return inputs
 
-    return component_function
+    def set_inputs(self, comp, args, kwargs):
+        """Set the persistent data of the inputs, and return the indices of the inputs
+        changed."""
+        changed = []
+        for i, arg in self.get_inputs(comp, args, kwargs):
+            __set_input_uo__(comp.Params.Input[i], arg)
+            changed.append(i)
+        return changed
 
+    def reset_inputs(self, instance, changed):
+        """Reset the changed inputs to the persistent data of a new instance."""
+        comp, doc, defaults = instance
+        for i in changed:
+            param = comp.Params.Input[i]
+            param.PersistentData.Clear()
+            param.PersistentData.MergeStructure(defaults[i])
 
-class function_helper(object):
-    def __init__(self, proxy, name):
-        self.proxy = proxy
-        self.return_type = None
+    def dispose(self, instance):
+        instance[0].ClearData()
+        instance[1].Dispose()
+
+    def set_pool_size(self, pool_size):
+        """Set how many idle component instances, each in its own document, to keep
+        between calls. 0 creates a new instance and document for every call."""
+        self.pool_size = max(0, pool_size)
+        while len(self.pool) > self.pool_size:
+            self.dispose(self.pool.pop())
+
+    def release(self):
+        """Dispose all the idle component instances."""
+        while self.pool:
+            self.dispose(self.pool.pop())
+
+    def get_output_values(self, params):
+        output_values = []
+        for output in params.Output:
+            data = output.VolatileData.AllData(True)
+            # We could call Value, but ScriptVariable seems to do a better job
+            v = [x.ScriptVariable() for x in data]
+            if len(v) < 1:
+                output_values.append(None)
+            elif len(v) == 1:
+                output_values.append(v[0])
+            else:
+                output_values.append(v)
+        return output_values
 
     def create_output(self, params, output_values=None):
         if not output_values:
-            output_values = []
-            for output in params.Output:
-                data = output.VolatileData.AllData(True)
-                # We could call Value, but ScriptVariable seems to do a better job
-                v = [x.ScriptVariable() for x in data]
-                if len(v) < 1:
-                    output_values.append(None)
-                elif len(v) == 1:
-                    output_values.append(v[0])
-                else:
-                    output_values.append(v)
+            output_values = self.get_output_values(params)
         if len(output_values) == 1: return output_values[0]
         if self.return_type is None:
             names = [output.Name.lower() for output in params.Output]
@@ -100,64 +262,132 @@ class function_helper(object):
         return False, None
 
 
-def __build_module_uo():
-    core_module = sys.modules[__name__]
-    translate_from = u"|+-*\u2070\u00B9\u00B2\u00B3\u2074\u2075\u2076\u2077\u2078\u2079"
-    translate_to = "X__x0123456789"
-    transl = dict(zip(translate_from, translate_to))
+_translate_from = u"|+-*\u2070\u00B9\u00B2\u00B3\u2074\u2075\u2076\u2077\u2078\u2079"
+_translate_to = "X__x0123456789"
+_transl = dict(zip(_translate_from, _translate_to))
+
 
-    def regex_helper(match):
-        if match.group() in transl:
-            return transl[match.group()]
-        return ''
+def _regex_helper(match):
+    if match.group() in _transl:
+        return _transl[match.group()]
+    return ''
 
-    def function_description(description, params):
-        rc = ['', description, "Input:"]
-        for param in params.Input:
+
+def _function_description(description, params):
+    rc = ['', description, "Input:"]
+    for param in params.Input:
+        s = "\t{0} [{1}] - {2}"
+        if param.Optional:
+            s = "\t{0} (in, optional) [{1}] - {2}"
+        rc.append(s.format(param.Name.lower(), param.TypeName, param.Description))
+    if params.Output.Count == 1:
+        param = params.Output[0]
+        rc.append("Returns: [{0}] - {1}".format(param.TypeName, param.Description))
+    elif params.Output.Count > 1:
+        rc.append("Returns:")
+        for out in params.Output:
             s = "\t{0} [{1}] - {2}"
-            if param.Optional:
-                s = "\t{0} (in, optional) [{1}] - {2}"
-            rc.append(s.format(param.Name.lower(), param.TypeName, param.Description))
-        if params.Output.Count == 1:
-            param = params.Output[0]
-            rc.append("Returns: [{0}] - {1}".format(param.TypeName, param.Description))
-        elif params.Output.Count > 1:
-            rc.append("Returns:")
-            for out in params.Output:
-                s = "\t{0} [{1}] - {2}"
-                rc.append(s.format(out.Name.lower(), out.TypeName, out.Description))
-        return '\n'.join(rc)
+            rc.append(s.format(out.Name.lower(), out.TypeName, out.Description))
+    return '\n'.join(rc)
+
 
+def _build_index():
+    """Map the function name of every user object to its proxy, without creating any
+    component instance."""
+    index = {}
     for obj in gh.Instances.ComponentServer.ObjectProxies:
         if obj.Exposure == gh.Kernel.GH_Exposure.hidden or obj.Obsolete:
             continue
 
         library_id = obj.LibraryGuid
         assembly = gh.Instances.ComponentServer.FindAssembly(library_id)
-        name = obj.Desc.Name
+        if assembly is not None:
+            # Compiled components, leave them to ghpythonlib
+            continue
 
+        name = obj.Desc.Name
         if "LEGACY" in name or "#" in name:
             continue
-        name = re.sub("[^_a-zA-Z0-9]", regex_helper, name)
+        name = re.sub("[^_a-zA-Z0-9]", _regex_helper, name)
         if not name[0].isalpha():
             name = 'x' + name
+        index[name] = obj
+    return index
+
+
+def _make_function(name, obj, pool_size=0):
+    """Create the function of a user object, with its docstring."""
+    function = __make_function_uo__(function_helper(obj, name, pool_size))
+    function.__name__ = name
+    try:
+        comp = obj.CreateInstance()
+        function.__doc__ = _function_description(obj.Desc.Description, comp.Params)
+    except Exception as err:
+        Rhino.RhinoApp.WriteLine(str(err))
+        Rhino.Runtime.HostUtils.ExceptionReport("ghpythonlib.components.py|" + name,
+                                                err.clsException)
+    return function
 
-        if assembly is not None:
-            # Compiled components, leave them to ghpythonlib
-            continue
 
-        function = __make_function_uo__(function_helper(obj, name))
-        m = core_module
+class lazy_module(types.ModuleType):
+    """Module whose user object functions are created on first attribute access.
+
+    Listing the user objects is cheap, but creating an instance of each of them to
+    build its docstring takes seconds with many plugins installed.
+    """
+
+    def __init__(self, module):
+        super(lazy_module, self).__init__(module.__name__, module.__doc__)
+        self.__dict__.update(module.__dict__)
+        # The functions of this module use the globals of the original module, that
+        # are cleared if it is garbage collected
+        self._module = module
+        self._index = None
+        self._pool_size = 0
+
+    def __getattr__(self, name):
+        # Only called for names that are not already defined
+        if name.startswith('_'):
+            raise AttributeError(name)
         try:
-            setattr(m, name, function)
-            a = m.__dict__[name]
-            a.__name__ = name
-            comp = obj.CreateInstance()
-            a.__doc__ = function_description(obj.Desc.Description, comp.Params)
-        except Exception as err:
-            Rhino.RhinoApp.WriteLine(str(err))
-            Rhino.Runtime.HostUtils.ExceptionReport("ghpythonlib.components.py|" + name,
-                                                    err.clsException)
-
-
-__build_module_uo()
+            obj = self._get_index()[name]
+        except KeyError:
+            raise AttributeError(
+                "module '{0}' has no attribute '{1}'".format(self.__name__, name))
+        function = _make_function(name, obj, self._pool_size)
+        setattr(self, name, function)
+        return function
+
+    def __dir__(self):
+        return sorted(
+            set(dir(type(self))) | set(self.__dict__) | set(self._get_index()))
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = _build_index()
+        return self._index
+
+    def _get_functions(self):
+        if self._index is None:
+            return []
+        return [self.__dict__[name] for name in self._index if name in self.__dict__]
+
+    def build_all(self):
+        """Create the functions of all the user objects now."""
+        for name in self._get_index():
+            getattr(self, name)
+
+    def set_pool_size(self, pool_size):
+        """Set how many idle component instances the user object functions keep
+        between calls, for the functions already created and the next ones."""
+        self._pool_size = max(0, pool_size)
+        for function in self._get_functions():
+            function.set_pool_size(self._pool_size)
+
+    def release_all(self):
+        """Dispose the idle component instances of all the user object functions."""
+        for function in self._get_functions():
+            function.release()
+
+
+sys.modules[__name__] = lazy_module(sys.modules[__name__])
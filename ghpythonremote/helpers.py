@@ -17,16 +17,42 @@ try:
 except ImportError:
     pass
 
-WINDOWS = False
-MACOS = False
-# "cli" is for IronPython in Rhino 5
-if platform.system() == "Windows" or (RUNNING_IN_RHINO5 and platform.system() == "cli"):
-    WINDOWS = True
-if platform.system() == "Darwin":
-    MACOS = True
-if platform.system() == "Linux" or not (WINDOWS or MACOS):
-    logger.error("Unknown platform {!s}".format(platform.system()))
-    raise RuntimeError("This package only runs on Windows and MacOS")
+PLATFORMS = ("windows", "macos", "linux")
+# Environment variable to override the platform detection, with one of PLATFORMS
+PLATFORM_ENV_VAR = "GHPYTHONREMOTE_PLATFORM"
+
+
+def detect_platform():
+    """Return the platform this package runs on, one of PLATFORMS.
+
+    The GHPYTHONREMOTE_PLATFORM environment variable overrides the detection. On Linux,
+    there is no Rhino: only the remote Python side works, for tests and benchmarks.
+    """
+    override = os.environ.get(PLATFORM_ENV_VAR)
+    if override:
+        if override.lower() not in PLATFORMS:
+            raise RuntimeError(
+                "{!s}={!s} is not one of {!s}.".format(
+                    PLATFORM_ENV_VAR, override, ", ".join(PLATFORMS)
+                )
+            )
+        return override.lower()
+    system = platform.system()
+    # "cli" is for IronPython in Rhino 5
+    if system == "Windows" or (RUNNING_IN_RHINO5 and system == "cli"):
+        return "windows"
+    if system == "Darwin":
+        return "macos"
+    if system == "Linux":
+        return "linux"
+    logger.error("Unknown platform {!s}".format(system))
+    raise RuntimeError("This package only runs on Windows, MacOS, and Linux")
+
+
+PLATFORM = detect_platform()
+WINDOWS = PLATFORM == "windows"
+MACOS = PLATFORM == "macos"
+LINUX = PLATFORM == "linux"
 
 if WINDOWS:
     try:
@@ -36,6 +62,24 @@ if WINDOWS:
 
 DEFAULT_RHINO_VERSION = 7
 
+# Persistent cache of resolved python executables, by location
+if WINDOWS:
+    LOCATION_CACHE_PATH = os.path.join(
+        os.getenv("LOCALAPPDATA", os.getenv("APPDATA", "")),
+        "ghpythonremote",
+        "location_cache.json",
+    )
+elif MACOS:
+    LOCATION_CACHE_PATH = os.path.join(
+        os.path.expanduser("~"), "Library", "Caches", "ghpythonremote", "location_cache.json"
+    )
+else:
+    LOCATION_CACHE_PATH = os.path.join(
+        os.getenv("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+        "ghpythonremote",
+        "location_cache.json",
+    )
+
 
 # IronPython is being picky about check_output in Mono, because some arguments are not supported. Base functionallity works:
 def _mono_check_output(*popenargs, **kwargs):
@@ -52,7 +96,105 @@ def _mono_check_output(*popenargs, **kwargs):
     return output
 
 
-def get_python_path(location=None):
+def get_python_path(location=None, refresh=False):
+    """Find the python executable for a location, from the persistent cache if the
+    python installation did not change since it was cached.
+
+    Parameters
+    ----------
+    location : str
+        Path to a python executable or its folder, "conda://env_name", or empty to use
+        the python in the PATH.
+    refresh : bool
+        Ignore the cache, and resolve the location again.
+    """
+    key = location or ""
+    cache = _read_location_cache()
+    if not refresh:
+        entry = cache.get(key)
+        if entry is not None and _is_location_cache_entry_valid(entry):
+            logger.debug("Using cached python executable for location {!r}".format(key))
+            return entry["python_exe"]
+    python_exe = _resolve_python_path(location)
+    if key.startswith("conda://") and os.path.basename(
+        _get_env_dir(python_exe)
+    ) != key.partition("://")[2]:
+        # Fell back to another python, resolve again next time
+        return python_exe
+    cache[key] = {
+        "python_exe": python_exe,
+        "env_path": os.environ.get("PATH", ""),
+        "stamps": _get_location_stamps(python_exe),
+    }
+    _write_location_cache(cache)
+    return python_exe
+
+
+def clear_location_cache():
+    """Delete the persistent cache of python executables, to resolve all locations
+    again."""
+    try:
+        os.remove(LOCATION_CACHE_PATH)
+    except OSError:
+        pass
+
+
+def _get_env_dir(python_exe):
+    if WINDOWS:
+        return os.path.dirname(python_exe)
+    else:
+        return os.path.dirname(os.path.dirname(python_exe))
+
+
+def _get_location_stamps(python_exe):
+    # The executable, its environment folder, and the folder of all the environments:
+    # creating, deleting, or updating an environment changes one of their mtimes
+    env_dir = _get_env_dir(python_exe)
+    stamps = {}
+    for path in [python_exe, env_dir, os.path.dirname(env_dir)]:
+        try:
+            stamps[path] = os.path.getmtime(path)
+        except OSError:
+            stamps[path] = None
+    return stamps
+
+
+def _is_location_cache_entry_valid(entry):
+    try:
+        if entry["env_path"] != os.environ.get("PATH", ""):
+            return False
+        return _get_location_stamps(entry["python_exe"]) == entry["stamps"]
+    except (KeyError, TypeError):
+        return False
+
+
+def _read_location_cache():
+    try:
+        with open(LOCATION_CACHE_PATH) as f:
+            cache = json.load(f)
+        if isinstance(cache, dict):
+            return cache
+    except (IOError, OSError, ValueError) as e:
+        logger.debug("Could not read location cache: {!s}".format(e))
+    return {}
+
+
+def _write_location_cache(cache):
+    try:
+        cache_dir = os.path.dirname(LOCATION_CACHE_PATH)
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        temp_path = LOCATION_CACHE_PATH + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(cache, f)
+        if os.path.exists(LOCATION_CACHE_PATH):
+            os.remove(LOCATION_CACHE_PATH)
+        os.rename(temp_path, LOCATION_CACHE_PATH)
+    except (IOError, OSError) as e:
+        logger.debug("Could not write location cache: {!s}".format(e))
+
+
+def _resolve_python_path(location=None):
     if location is None or location == "":
         if WINDOWS:
             return get_python_from_windows_path()
@@ -145,7 +287,15 @@ def get_python_from_macos_path():
         raise e
 
 
+def _check_rhino_platform():
+    if LINUX:
+        raise RuntimeError("Rhino is only available on Windows and MacOS.")
+
+
 def get_python_from_conda_env(env_name):
+    conda_exe_path = os.environ.get("CONDA_EXE")
+    if LINUX and conda_exe_path is None:
+        conda_exe_path = "conda"
     if MACOS:
         # Need to find the conda exec from the .zshrc file
         try:
@@ -272,6 +422,7 @@ def get_extended_env_path_conda(python_exe):
 
 
 def get_rhino_ironpython_path(location=None):
+    _check_rhino_platform()
     if location is None or location == "":
         if WINDOWS:
             return get_ironpython_from_windows_appdata()
@@ -518,6 +669,7 @@ def get_ironpython_from_path(location):
 
 
 def get_gh_userobjects_path(location=None):
+    _check_rhino_platform()
     if location is None or location == "":
         if WINDOWS:
             return get_userobjects_from_windows_appdata()
@@ -603,6 +755,7 @@ def get_userobjects_from_path(location):
 
 
 def get_rhino_executable_path(version=DEFAULT_RHINO_VERSION, preferred_bitness="same"):
+    _check_rhino_platform()
     if WINDOWS:
         return get_rhino_windows_path(version, preferred_bitness)
     else:
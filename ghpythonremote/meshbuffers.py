@@ -0,0 +1,263 @@
+"""Bulk transfer of Rhino meshes as contiguous typed buffers.
+
+Iterating mesh.Vertices and mesh.Faces through netrefs takes one round trip per item,
+minutes for a large mesh. Instead, the mesh lists are copied in bulk in Rhino, with
+their ToFloatArray/ToIntArray methods and Buffer.BlockCopy, into the typed buffers of
+the arrays module, and sent in a single message:
+    (vertices, faces, normals, colors), each a (dtype, shape, buffer) or None;
+    vertices: float32 (n, 3), the single precision vertices of the mesh;
+    faces: int32 (m, 4), the vertex indices of each face, the last two equal for
+    triangles;
+    normals: float32 (n, 3), the vertex normals;
+    colors: uint8 (n, 4), the vertex colors, in the B, G, R, A byte order of the ARGB
+    integers of System.Drawing.Color. to_value reorders them as R, G, B, A.
+export_mesh and import_mesh run in Rhino, to_value and from_value in CPython. This
+module is imported on both sides of the connection.
+"""
+import logging
+from collections import namedtuple
+
+from . import arrays, sharedmem
+
+logger = logging.getLogger("ghpythonremote.meshbuffers")
+
+# Mesh as arrays, numpy.ndarray, array.array or None for missing normals and colors
+MeshBuffers = namedtuple("MeshBuffers", ["vertices", "faces", "normals", "colors"])
+
+# Reorders B, G, R, A to R, G, B, A and back
+_SWAP_RED_BLUE = [2, 1, 0, 3]
+
+
+def export_mesh(mesh, normals=True, colors=True, threshold=None):
+    """In Rhino, copy the lists of a mesh into typed buffers.
+
+    Parameters
+    ----------
+    mesh : Rhino.Geometry.Mesh
+        Mesh to export.
+    normals, colors : bool
+        Export the vertex normals, and the vertex colors. Missing ones are exported as
+        None.
+    threshold : int
+        If given, wrap the buffers of at least that many bytes in sharedmem payloads.
+
+    Returns
+    -------
+    (vertices, faces, normals, colors) tuple of packed arrays, see the module
+    docstring.
+    """
+    n_vertices = mesh.Vertices.Count
+    packed_vertices = _pack_net(mesh.Vertices.ToFloatArray(), "float32", (n_vertices, 3))
+    packed_faces = _pack_net(
+        mesh.Faces.ToIntArray(False), "int32", (mesh.Faces.Count, 4)
+    )
+    packed_normals = None
+    if normals and mesh.Normals.Count == n_vertices:
+        packed_normals = _pack_net(mesh.Normals.ToFloatArray(), "float32", (n_vertices, 3))
+    packed_colors = None
+    if colors and mesh.VertexColors.Count == n_vertices:
+        packed_colors = _pack_net(
+            mesh.VertexColors.ToARGBArray(), "uint8", (n_vertices, 4)
+        )
+    result = (packed_vertices, packed_faces, packed_normals, packed_colors)
+    if threshold is not None:
+        result = tuple(_share(packed, threshold) for packed in result)
+    return result
+
+
+def import_mesh(vertices, faces, normals=None, colors=None):
+    """In Rhino, build a mesh from typed buffers.
+
+    Takes the packed arrays returned by export_mesh or from_value. Normals are
+    computed if not given.
+
+    Returns
+    -------
+    Rhino.Geometry.Mesh
+    """
+    import System
+    import Rhino.Geometry as rg
+
+    mesh = rg.Mesh()
+    xyz = _unpack_net(vertices, "float32", System.Single, 4)
+    mesh.Vertices.AddVertices(
+        System.Array[rg.Point3f](
+            [rg.Point3f(xyz[i], xyz[i + 1], xyz[i + 2]) for i in range(0, len(xyz), 3)]
+        )
+    )
+    indices = _unpack_net(faces, "int32", System.Int32, 4)
+    mesh.Faces.AddFaces(
+        System.Array[rg.MeshFace](
+            [
+                rg.MeshFace(indices[i], indices[i + 1], indices[i + 2], indices[i + 3])
+                for i in range(0, len(indices), 4)
+            ]
+        )
+    )
+    if normals is not None:
+        xyz = _unpack_net(normals, "float32", System.Single, 4)
+        mesh.Normals.SetNormals(
+            System.Array[rg.Vector3f](
+                [rg.Vector3f(xyz[i], xyz[i + 1], xyz[i + 2]) for i in range(0, len(xyz), 3)]
+            )
+        )
+    else:
+        mesh.Normals.ComputeNormals()
+    if colors is not None:
+        argb = _unpack_net(colors, "uint8", System.Int32, 4)
+        mesh.VertexColors.SetColors(
+            System.Array[System.Drawing.Color](
+                [System.Drawing.Color.FromArgb(value) for value in argb]
+            )
+        )
+    mesh.Compact()
+    return mesh
+
+
+def to_value(packed_mesh, as_numpy=True):
+    """In CPython, build MeshBuffers from the result of export_mesh.
+
+    Parameters
+    ----------
+    packed_mesh : tuple
+        Result of export_mesh.
+    as_numpy : bool
+        Build numpy arrays, read-only views on the received buffers except for the
+        reordered colors. Otherwise, build flat array.array.
+    """
+    vertices, faces, normals, colors = packed_mesh
+    if as_numpy:
+        unpack = lambda packed: arrays.to_ndarray(*packed)
+    else:
+        unpack = lambda packed: arrays.unpack(*packed, flat=True)
+    colors = None if colors is None else _swap_red_blue(unpack(colors))
+    return MeshBuffers(
+        unpack(vertices),
+        unpack(faces),
+        None if normals is None else unpack(normals),
+        colors,
+    )
+
+
+def from_value(vertices, faces, normals=None, colors=None, threshold=None):
+    """In CPython, pack arrays for import_mesh.
+
+    Parameters
+    ----------
+    vertices : array-like
+        (n, 3) vertex coordinates.
+    faces : array-like
+        (m, 3) triangles or (m, 4) quads of vertex indices, a quad with its last two
+        indices equal being a triangle.
+    normals : array-like
+        (n, 3) vertex normals, or None to compute them in Rhino.
+    colors : array-like
+        (n, 4) R, G, B, A or (n, 3) R, G, B vertex colors, from 0 to 255, or None.
+    threshold : int
+        If given, wrap the buffers of at least that many bytes in sharedmem payloads.
+
+    Returns
+    -------
+    (vertices, faces, normals, colors) tuple of packed arrays.
+    """
+    import numpy
+
+    if colors is not None:
+        colors = numpy.asarray(colors, dtype="uint8")
+        if colors.ndim == 2 and colors.shape[1] == 3:
+            colors = numpy.column_stack(
+                [colors, numpy.full(len(colors), 255, dtype="uint8")]
+            )
+        colors = colors[:, _SWAP_RED_BLUE]
+    return (
+        arrays.from_ndarray(vertices, "float32", threshold),
+        pack_faces(faces, threshold),
+        None if normals is None else arrays.from_ndarray(normals, "float32", threshold),
+        None if colors is None else arrays.from_ndarray(colors, "uint8", threshold),
+    )
+
+
+def pack_faces(faces, threshold=None):
+    """Pack faces into an int32 (m, 4) typed buffer, triangles repeating their last
+    index.
+
+    Parameters
+    ----------
+    faces : numpy.ndarray or sequence
+        (m, 3) triangles or (m, 4) quads of vertex indices, or a sequence of faces of
+        3 or 4 indices each, packed without numpy.
+    threshold : int
+        If given, wrap the buffer in a sharedmem payload if it is at least that many
+        bytes.
+
+    Returns
+    -------
+    (dtype, shape, buffer) packed array.
+    """
+    if hasattr(faces, "dtype"):
+        import numpy
+
+        if faces.ndim == 2 and faces.shape[1] == 3:
+            faces = numpy.column_stack([faces, faces[:, 2]])
+        return arrays.from_ndarray(faces, "int32", threshold)
+    packed = arrays.pack(
+        [tuple(face) + (face[-1],) * (4 - len(face)) for face in faces],
+        "int32",
+        (len(faces), 4),
+    )
+    if threshold is not None:
+        packed = _share(packed, threshold)
+    return packed
+
+
+def _swap_red_blue(colors):
+    if hasattr(colors, "dtype"):
+        return colors[:, _SWAP_RED_BLUE]
+    swapped = colors[:]
+    swapped[0::4] = colors[2::4]
+    swapped[2::4] = colors[0::4]
+    return swapped
+
+
+def _pack_net(net_array, dtype, shape):
+    """Copy a .NET array of numbers into a typed buffer, with a single BlockCopy."""
+    import System
+
+    n_bytes = System.Buffer.ByteLength(net_array)
+    raw = System.Array.CreateInstance(System.Byte, n_bytes)
+    System.Buffer.BlockCopy(net_array, 0, raw, 0, n_bytes)
+    return str(dtype), tuple(shape), _latin1().GetString(raw)
+
+
+def _unpack_net(packed, dtype, net_type, item_size):
+    """Copy a typed buffer of dtype into a .NET array of net_type, of item_size bytes,
+    with a single BlockCopy."""
+    import System
+
+    if packed[0] != dtype:
+        raise TypeError(
+            "Expected a buffer of {!s} to build a mesh, got {!s}.".format(
+                dtype, packed[0]
+            )
+        )
+    buf = packed[2]
+    if isinstance(buf, tuple):
+        buf = sharedmem.unpack_bytes(buf)
+    raw = _latin1().GetBytes(buf)
+    result = System.Array.CreateInstance(net_type, len(raw) // item_size)
+    System.Buffer.BlockCopy(raw, 0, result, 0, len(raw))
+    return result
+
+
+def _latin1():
+    # IronPython strings hold bytes as characters 0 to 255, Latin-1 maps them 1 to 1
+    import System
+
+    return System.Text.Encoding.GetEncoding(28591)
+
+
+def _share(packed, threshold):
+    if packed is None:
+        return None
+    dtype, shape, buf = packed
+    return dtype, shape, sharedmem.pack_bytes(buf, threshold)
@@ -1,8 +1,116 @@
 import inspect
+import socket
 import sys
+import types
+import weakref
+import zlib
 
 import rpyc
 
+
+class _WeakIdCache(object):
+    """Values by object identity, dropped when the object is collected. Lookups do not
+    create weak references, and objects that cannot be weakly referenced are not
+    cached."""
+
+    def __init__(self):
+        self._entries = {}
+
+    def get(self, obj):
+        entry = self._entries.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        return None
+
+    def set(self, obj, value):
+        key = id(obj)
+        try:
+            ref = weakref.ref(obj, lambda ref, key=key: self._remove(key, ref))
+        except TypeError:
+            return
+        self._entries[key] = (ref, value)
+
+    def clear(self):
+        self._entries.clear()
+
+    def _remove(self, key, ref):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._entries[key]
+
+
+# Name of the id_pack of the instances of a type, or False if it cannot be cached
+_instance_name_packs = _WeakIdCache()
+# id_pack of classes
+_class_id_packs = _WeakIdCache()
+# Method tables returned to inspect requests, by type, or by class for classes
+_method_tables = _WeakIdCache()
+
+
+def cache_id_pack(get_id_pack):
+    """Wrap a get_id_pack function to cache the parts of the id_pack that only depend
+    on the type of the object, and the id_pack of classes.
+
+    A type is cached the first time one of its instances gets the same id_pack from
+    get_id_pack as from its type alone, so the result is always the same as
+    get_id_pack.
+    """
+
+    def cached_get_id_pack(obj):
+        cls = type(obj)
+        name_pack = _instance_name_packs.get(cls)
+        if name_pack and getattr(obj, "__name__", None) != "module":
+            return (name_pack, id(cls), id(obj))
+        id_pack = _class_id_packs.get(obj)
+        if id_pack is not None:
+            return id_pack
+        id_pack = get_id_pack(obj)
+        if name_pack is None:
+            _cache_id_pack(cls, obj, id_pack)
+        return id_pack
+
+    cached_get_id_pack.__doc__ = get_id_pack.__doc__
+    return cached_get_id_pack
+
+
+def _cache_id_pack(cls, obj, id_pack):
+    if issubclass(cls, rpyc.core.netref.BaseNetref):
+        # Do not touch netrefs, any access can be a request
+        _instance_name_packs.set(cls, False)
+        return
+    if id_pack[2] == 0:
+        if inspect.isclass(obj):
+            _class_id_packs.set(obj, id_pack)
+        return
+    if (
+        issubclass(cls, (types.ModuleType, type))
+        or cls is types.InstanceType
+        or cls is types.ClassType
+        or obj.__class__ is not cls
+    ):
+        _instance_name_packs.set(cls, False)
+        return
+    name_pack = "{0}.{1}".format(cls.__module__, cls.__name__)
+    if id_pack == (name_pack, id(cls), id(obj)):
+        _instance_name_packs.set(cls, name_pack)
+    else:
+        _instance_name_packs.set(cls, False)
+
+
+def get_methods(obj):
+    """Cached rpyc.lib.get_methods of the local attributes of an object.
+
+    The methods of an instance only depend on its type, and the methods of a class on
+    the class.
+    """
+    key = obj if isinstance(obj, type) else type(obj)
+    methods = _method_tables.get(key)
+    if methods is None:
+        methods = tuple(rpyc.lib.get_methods(rpyc.core.netref.LOCAL_ATTRS, obj))
+        _method_tables.set(key, methods)
+    return methods
+
+
 if sys.platform == "cli":
     # Some compatibility fixes for IronPython
     rpyc.core.brine.IMM_INTS = dict((i, bytes([i + 0x50])) for i in range(-0x30, 0xA0))
@@ -78,25 +186,6 @@ if sys.platform == "cli":
                 name_pack = "{0}.{1}".format(obj.__module__, obj.__name__)
                 return (name_pack, id(obj), 0)
 
-        def _handle_inspect(self, id_pack):  # request handler
-            obj = self._local_objects[id_pack]
-            if hasattr(obj, "____conn__") and not isinstance(
-                obj, ghpythonlib.components.__namedtuple
-            ):
-                # When RPyC is chained (RPyC over RPyC), id_pack is cached in local objects as a netref
-                # since __mro__ is not a safe attribute the request is forwarded using the proxy connection
-                # see issue #346 or tests.test_rpyc_over_rpyc.Test_rpyc_over_rpyc
-                conn = self._local_objects[id_pack].____conn__
-                return conn.sync_request(rpyc.core.consts.HANDLE_INSPECT, id_pack)
-            else:
-                return tuple(
-                    rpyc.lib.get_methods(
-                        rpyc.core.netref.LOCAL_ATTRS, self._local_objects[id_pack]
-                    )
-                )
-
-        rpyc.core.protocol.Connection._handle_inspect = _handle_inspect
-        
     else:
 
         def get_id_pack(obj):
@@ -149,10 +238,28 @@ if sys.platform == "cli":
                 name_pack = "{0}.{1}".format(obj.__module__, obj.__name__)
                 return (name_pack, id(obj), 0)
 
+    # get_id_pack runs on every object sent, and is slow in IronPython
+    get_id_pack = cache_id_pack(get_id_pack)
     rpyc.lib.get_id_pack = get_id_pack
     rpyc.core.netref.get_id_pack = get_id_pack
     rpyc.core.protocol.get_id_pack = get_id_pack
 
+    def _handle_inspect(self, id_pack):  # request handler
+        obj = self._local_objects[id_pack]
+        if hasattr(obj, "____conn__") and not (
+            fix_rhino_getattr
+            and isinstance(obj, ghpythonlib.components.__namedtuple)
+        ):
+            # When RPyC is chained (RPyC over RPyC), id_pack is cached in local objects as a netref
+            # since __mro__ is not a safe attribute the request is forwarded using the proxy connection
+            # see issue #346 or tests.test_rpyc_over_rpyc.Test_rpyc_over_rpyc
+            conn = self._local_objects[id_pack].____conn__
+            return conn.sync_request(rpyc.core.consts.HANDLE_INSPECT, id_pack)
+        else:
+            return get_methods(obj)
+
+    rpyc.core.protocol.Connection._handle_inspect = _handle_inspect
+
     if sys.version_info < (2, 7, 5):
 
         def dump(obj):
@@ -161,20 +268,6 @@ if sys.platform == "cli":
             return b"".join(map(bytes, stream))
 
         rpyc.core.brine.dump = dump
-
-        import socket
-
-        def write(self, data):
-            try:
-                while data:
-                    count = self.sock.send(buffer(data[: self.MAX_IO_CHUNK]))
-                    data = data[count:]
-            except socket.error:
-                ex = sys.exc_info()[1]
-                self.close()
-                raise EOFError(ex)
-
-        rpyc.core.stream.SocketStream.write = write
 else:
     # This is only needed if the local is CPython and the remote is IronPython, doesn't
     # really hurt otherwise
@@ -184,3 +277,93 @@ else:
         return _netref_factory_orig(self, (str(id_pack[0]), id_pack[1], id_pack[2]))
 
     rpyc.core.protocol.Connection._netref_factory = _netref_factory_str
+
+
+# Send and receive large frames without copying them over and over. rpyc slices off
+# the data left to send after each chunk, which is quadratic in the size of the frame,
+# and copies every frame received once more to drop its trailing flusher.
+_rpyc_socket_stream_read = rpyc.core.stream.SocketStream.read
+_rpyc_socket_stream_write = rpyc.core.stream.SocketStream.write
+_rpyc_channel_recv = rpyc.core.channel.Channel.recv
+
+if sys.platform == "cli" and sys.version_info >= (2, 7, 5):
+    # Recent IronPython sockets send strings, copy one chunk at a time
+
+    def _chunk(data, offset, size):
+        return data[offset : offset + size]
+
+
+else:
+    # Zero-copy view on the data, old IronPython cannot send strings either
+    _chunk = buffer
+
+
+def _can_recv_into():
+    if sys.platform == "cli":
+        return False
+    try:
+        memoryview(bytearray(2))[1:]
+    except (NameError, TypeError):
+        return False
+    return hasattr(socket.socket, "recv_into")
+
+
+def socket_stream_write(self, data):
+    """SocketStream.write that sends from an offset in data, instead of slicing off
+    the data left after each chunk."""
+    offset = 0
+    size = len(data)
+    try:
+        while offset < size:
+            offset += self.sock.send(_chunk(data, offset, self.MAX_IO_CHUNK))
+    except socket.error:
+        ex = sys.exc_info()[1]
+        self.close()
+        raise EOFError(ex)
+
+
+def socket_stream_read(self, count):
+    """SocketStream.read that receives into a single preallocated buffer, instead of
+    joining the received chunks."""
+    buf = bytearray(count)
+    view = memoryview(buf)
+    offset = 0
+    while offset < count:
+        try:
+            n_received = self.sock.recv_into(view[offset:], count - offset)
+        except socket.timeout:
+            continue
+        except socket.error:
+            ex = sys.exc_info()[1]
+            if rpyc.lib.compat.get_exc_errno(ex) in rpyc.core.stream.retry_errnos:
+                continue
+            self.close()
+            raise EOFError(ex)
+        if not n_received:
+            self.close()
+            raise EOFError("connection closed by peer")
+        offset += n_received
+    return bytes(buf)
+
+
+def channel_recv(self):
+    """Channel.recv that reads the trailing flusher of large frames separately,
+    instead of copying the frame to drop it."""
+    header = self.stream.read(self.FRAME_HEADER.size)
+    length, compressed = self.FRAME_HEADER.unpack(header)
+    flush_size = len(self.FLUSHER)
+    if length + flush_size <= self.stream.MAX_IO_CHUNK:
+        # One read is cheaper than a copy for small frames
+        data = self.stream.read(length + flush_size)[:-flush_size]
+    else:
+        data = self.stream.read(length)
+        self.stream.read(flush_size)
+    if compressed:
+        data = zlib.decompress(data)
+    return data
+
+
+rpyc.core.stream.SocketStream.write = socket_stream_write
+rpyc.core.channel.Channel.recv = channel_recv
+if _can_recv_into():
+    rpyc.core.stream.SocketStream.read = socket_stream_read
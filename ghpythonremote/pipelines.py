@@ -0,0 +1,153 @@
+"""Pipelines of Grasshopper components, executed entirely in Rhino.
+
+A pipeline is a small graph of component calls, where a step can take as inputs the
+outputs of previous steps. It is sent to Rhino in a single message as plain tuples:
+    steps: tuple of (component_name, is_cluster, args, kwargs);
+    args: tuple of inputs, kwargs: tuple of (name, input) pairs;
+    an input being ("value", value), or ("ref", step_index, key) for the result of a
+    previous step, or its output key (index or name) if key is not None.
+Intermediate results stay in Rhino, only the outputs asked for are sent back. This
+module is imported on both sides of the connection.
+"""
+import logging
+
+from . import geometrycodec
+
+logger = logging.getLogger("ghpythonremote.pipelines")
+
+
+class Pipeline(object):
+    """Builder of a pipeline of Grasshopper components, run in Rhino in a single round
+    trip.
+
+    Parameters
+    ----------
+    connector : PythonToGrasshopperRemote
+        Connector that runs the pipeline. Usually created with
+        PythonToGrasshopperRemote.pipeline.
+
+    Examples
+    --------
+    >>> pipeline = py2gh.pipeline()
+    >>> divided = pipeline.add("DivideCurve", gh_curves, 10, False)
+    >>> circles = pipeline.add("CircleCNR", divided["points"], (0, 0, 1), 1.0)
+    >>> areas = pipeline.add("Area", circles)
+    >>> area, centroid = pipeline.run(areas["area"], areas["centroid"])
+    """
+
+    def __init__(self, connector=None):
+        self.connector = connector
+        self.steps = []
+
+    def add(self, component_name, *nargs, **kwargs):
+        """Add a call to a component, with the same arguments as
+        PythonToGrasshopperRemote.run_gh_component.
+
+        Inputs can be outputs of previous steps. Other inputs are sent as they are, so
+        pass tuples rather than lists to send them by value. Geometry value objects of
+        geometrycodec are sent encoded.
+
+        Returns
+        -------
+        StepOutput referencing the result of the call, index it with an output index
+        or name to reference one output of a component that has several.
+        """
+        is_cluster = kwargs.pop("is_cluster", False)
+        args = tuple(self._encode(arg) for arg in nargs)
+        kwargs = tuple((name, self._encode(kwargs[name])) for name in sorted(kwargs))
+        self.steps.append((str(component_name), bool(is_cluster), args, kwargs))
+        return StepOutput(self, len(self.steps) - 1)
+
+    def run(self, *outputs):
+        """Run the pipeline, see PythonToGrasshopperRemote.run_pipeline."""
+        if self.connector is None:
+            raise RuntimeError("This pipeline has no connector to run it.")
+        return self.connector.run_pipeline(self, *outputs)
+
+    def spec(self):
+        return tuple(self.steps)
+
+    def encode_outputs(self, outputs):
+        if not outputs:
+            raise ValueError("Ask for at least one output of the pipeline.")
+        for output in outputs:
+            if not isinstance(output, StepOutput):
+                raise TypeError("Outputs must be StepOutput of the pipeline.")
+        return tuple(self._encode(output) for output in outputs)
+
+    def _encode(self, value):
+        if isinstance(value, StepOutput):
+            if value.pipeline is not self:
+                raise ValueError("Cannot use the output of another pipeline.")
+            return "ref", value.index, value.key
+        return "value", geometrycodec.encode_value(value)
+
+
+class StepOutput(object):
+    """Reference to the result of a step of a pipeline, or to one of its outputs."""
+
+    def __init__(self, pipeline, index, key=None):
+        self.pipeline = pipeline
+        self.index = index
+        self.key = key
+
+    def __getitem__(self, key):
+        if self.key is not None:
+            raise ValueError("Already referencing output {!s}.".format(self.key))
+        if not isinstance(key, (int, str, unicode)):
+            raise TypeError("Output key must be an index or a name.")
+        return StepOutput(self.pipeline, self.index, key)
+
+    def __repr__(self):
+        component_name = self.pipeline.steps[self.index][0]
+        if self.key is None:
+            return "<StepOutput {:d} {!s}>".format(self.index, component_name)
+        return "<StepOutput {:d} {!s}[{!r}]>".format(
+            self.index, component_name, self.key
+        )
+
+
+def _select(result, key):
+    if key is None:
+        return result
+    if isinstance(key, int):
+        return result[key]
+    return getattr(result, key)
+
+
+def execute(steps, outputs, get_component):
+    """Run the steps of a pipeline, and return the values of the outputs asked for.
+
+    Runs in Rhino, get_component being GhcompService.get_component. Lists in the
+    outputs are converted to tuples, to be sent in the same message.
+    """
+    results = []
+
+    def decode(arg):
+        if arg[0] == "value":
+            return arg[1]
+        elif arg[0] == "ref":
+            index, key = arg[1], arg[2]
+            if not 0 <= index < len(results):
+                raise ValueError(
+                    "Step {:d} references step {:d}, that does not run before.".format(
+                        len(results), index
+                    )
+                )
+            return _select(results[index], key)
+        raise ValueError("Unknown pipeline input kind {!s}.".format(arg[0]))
+
+    for component_name, is_cluster, args, kwargs in steps:
+        logger.debug("Running pipeline step {!s}.".format(component_name))
+        component = get_component(component_name, is_cluster)
+        args = [decode(arg) for arg in args]
+        kwargs = dict((name, decode(arg)) for name, arg in kwargs)
+        results.append(component(*args, **kwargs))
+
+    values = []
+    for output in outputs:
+        value = decode(output)
+        if isinstance(value, list):
+            value = tuple(value)
+        values.append(value)
+    return tuple(values)
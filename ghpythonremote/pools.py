@@ -0,0 +1,397 @@
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from time import time
+
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+from . import sharedmem
+from .connectors import GrasshopperToPythonRemote
+
+logger = logging.getLogger("ghpythonremote.pools")
+
+
+class WarmPythonPool(object):
+    """Keeps remote Python interpreters launched, connected, and with modules already
+    imported, to hand them out without waiting.
+
+    Launching a remote Python, connecting to it, and importing large modules takes
+    seconds. The pool does that in background threads ahead of time, and replaces
+    every interpreter that it hands out.
+
+    Parameters
+    ----------
+    rpyc_server_py : str
+        Absolute path to the pythonservice.py module that launches the server on the
+        remote.
+    size : int
+        Number of ready interpreters to keep.
+    modules : iterable of str
+        Names of the modules to import in each interpreter before handing it out.
+    **connector_kwargs
+        Other arguments of GrasshopperToPythonRemote, for example location,
+        log_level, or working_dir.
+
+    Examples
+    --------
+    >>> pool = WarmPythonPool(rpyc_server_py, size=1, modules=["numpy"])
+    >>> with pool.acquire() as gh2py:
+    >>>     np = gh2py.py_remote_modules("numpy")  # Already imported
+    >>> pool.close()
+    """
+
+    def __init__(self, rpyc_server_py, size=1, modules=(), **connector_kwargs):
+        self.rpyc_server_py = rpyc_server_py
+        self.size = max(1, size)
+        self.modules = tuple(modules)
+        self.connector_kwargs = connector_kwargs
+        self.closed = False
+        self._ready = deque()
+        self._spawning = 0
+        self._spawn_threads = []
+        self._error = None
+        self._condition = threading.Condition()
+        self._replenish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def n_ready(self):
+        """Number of interpreters ready to be handed out."""
+        with self._condition:
+            return len(self._ready)
+
+    def acquire(self, timeout=None):
+        """Hand out a ready GrasshopperToPythonRemote, and launch its replacement.
+
+        The caller owns the connector, and has to close it when done.
+
+        Parameters
+        ----------
+        timeout : int
+            Number of seconds to wait for an interpreter if none is ready yet. By
+            default, the timeout of the connectors.
+        """
+        if timeout is None:
+            timeout = self.connector_kwargs.get("timeout", 60)
+        deadline = time() + timeout
+        with self._condition:
+            if self.closed:
+                raise RuntimeError("The pool of remote Python interpreters is closed.")
+            self._error = None
+            self._replenish()
+            connector = None
+            while connector is None:
+                while not self._ready and self._error is None:
+                    # Other wake-ups, for example another connector being recycled,
+                    # keep waiting until the deadline
+                    remaining = deadline - time()
+                    if remaining <= 0:
+                        raise RuntimeError(
+                            "No remote Python ready after {!s} seconds.".format(timeout)
+                        )
+                    self._condition.wait(remaining)
+                    if self.closed:
+                        raise RuntimeError(
+                            "The pool of remote Python interpreters is closed."
+                        )
+                if self._error is not None:
+                    error, self._error = self._error, None
+                    raise error
+                connector = self._ready.popleft()
+                if not _is_alive(connector):
+                    logger.info("Discarding a dead remote Python from the pool.")
+                    _close_quietly(connector)
+                    connector = None
+                self._replenish()
+        return connector
+
+    def close(self, timeout=None):
+        """Close all the ready interpreters, and wait for the ones being launched, that
+        are closed as soon as they are ready. Interpreters already handed out stay open.
+
+        Parameters
+        ----------
+        timeout : int
+            Number of seconds to wait for the interpreters being launched. By default,
+            the timeout of the connectors.
+        """
+        if timeout is None:
+            timeout = self.connector_kwargs.get("timeout", 60)
+        deadline = time() + timeout
+        with self._condition:
+            self.closed = True
+            while self._ready:
+                _close_quietly(self._ready.popleft())
+            spawn_threads = list(self._spawn_threads)
+            self._condition.notify_all()
+        for thread in spawn_threads:
+            thread.join(max(0, deadline - time()))
+        if any(thread.is_alive() for thread in spawn_threads):
+            logger.warning(
+                "Remote Pythons still launching after {!s} seconds, they will be closed "
+                "when ready.".format(timeout)
+            )
+
+    def _replenish(self):
+        # Must be called with the condition acquired
+        while not self.closed and len(self._ready) + self._spawning < self.size:
+            self._spawning += 1
+            thread = threading.Thread(target=self._spawn)
+            thread.daemon = True
+            self._spawn_threads.append(thread)
+            thread.start()
+
+    def _spawn(self):
+        connector = None
+        error = None
+        try:
+            connector = GrasshopperToPythonRemote(
+                self.rpyc_server_py, **self.connector_kwargs
+            )
+            for module in self.modules:
+                try:
+                    connector.py_remote_modules(module)
+                except ImportError:
+                    logger.warning(
+                        'Could not import module "{!s}" in remote Python.'.format(module)
+                    )
+        except Exception as e:
+            logger.error("Could not launch a remote Python for the pool: {!s}".format(e))
+            error = e
+            if connector is not None:
+                _close_quietly(connector)
+                connector = None
+        with self._condition:
+            self._spawning -= 1
+            self._spawn_threads.remove(threading.current_thread())
+            if connector is not None:
+                if self.closed:
+                    _close_quietly(connector)
+                else:
+                    self._ready.append(connector)
+            else:
+                self._error = error
+            self._condition.notify_all()
+
+
+class Future(object):
+    """Result of a call running in the background, with the same interface as
+    concurrent.futures.Future, which is not available in IronPython."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._result = None
+        self._exception = None
+
+    def done(self):
+        return self._event.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the call to finish, and return its result or raise its error."""
+        exception = self.exception(timeout)
+        if exception is not None:
+            raise exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Wait for the call to finish, and return its error, or None."""
+        if not self._event.wait(timeout) and not self._event.is_set():
+            raise RuntimeError("Result not ready after {!s} seconds.".format(timeout))
+        return self._exception
+
+    def set_result(self, result):
+        self._result = result
+        self._event.set()
+
+    def set_exception(self, exception):
+        self._exception = exception
+        self._event.set()
+
+
+class RemotePythonPool(object):
+    """Spreads calls over several remote Python interpreters, to use several cores.
+
+    Each worker is a GrasshopperToPythonRemote, called from its own thread through
+    run_py_function, so a worker whose Python crashes is relaunched and retries its
+    call, without failing the other calls.
+
+    Parameters
+    ----------
+    rpyc_server_py : str
+        Absolute path to the pythonservice.py module that launches the server on the
+        remote.
+    n_workers : int
+        Number of remote interpreters. By default, the number of processors.
+    **connector_kwargs
+        Other arguments of GrasshopperToPythonRemote, for example location,
+        log_level, or working_dir.
+
+    Examples
+    --------
+    >>> with RemotePythonPool(rpyc_server_py, n_workers=8) as pool:
+    >>>     roots = pool.map("math", "sqrt", range(1000), chunksize=50)
+    >>>     future = pool.submit("scipy.optimize", "brentq", f, 0, 1)
+    >>>     root = future.result()
+    """
+
+    def __init__(self, rpyc_server_py, n_workers=None, **connector_kwargs):
+        self.rpyc_server_py = rpyc_server_py
+        self.n_workers = max(1, n_workers or _cpu_count())
+        self.connector_kwargs = connector_kwargs
+        self.workers = self._launch_workers()
+        self._tasks = queue.Queue()
+        self._threads = []
+        for worker in self.workers:
+            thread = threading.Thread(target=self._work, args=(worker,))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def submit(self, module_name, function_name, *nargs, **kwargs):
+        """Run a Python function on the next free worker.
+
+        Takes the same arguments as GrasshopperToPythonRemote.run_py_function.
+
+        Returns
+        -------
+        Future of the result, a netref to an object of the worker if it cannot be
+        copied through the connection.
+        """
+
+        def call(worker):
+            return worker.run_py_function(module_name, function_name, *nargs, **kwargs)
+
+        return self._submit_call(call)
+
+    def map(self, module_name, function_name, iterable, chunksize=1):
+        """Apply a Python function to every item of iterable, on all the workers.
+
+        Items are sent to the workers in chunks, each chunk in a single round trip.
+        Items and results must be picklable, numpy results are converted to lists.
+
+        Returns
+        -------
+        List of the results, in the order of iterable.
+        """
+        items = list(iterable)
+        chunksize = max(1, chunksize)
+        futures = []
+        for start in range(0, len(items), chunksize):
+            futures.append(
+                self._submit_call(
+                    _make_chunk_call(
+                        module_name, function_name, items[start : start + chunksize]
+                    )
+                )
+            )
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+
+    def close(self):
+        for _ in self._threads:
+            self._tasks.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        for worker in self.workers:
+            _close_quietly(worker)
+
+    def _submit_call(self, call):
+        future = Future()
+        self._tasks.put((future, call))
+        return future
+
+    def _work(self, worker):
+        while True:
+            task = self._tasks.get()
+            if task is None:
+                return
+            future, call = task
+            try:
+                future.set_result(call(worker))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _launch_workers(self):
+        # Launch all the interpreters at the same time
+        workers = [None] * self.n_workers
+        errors = []
+
+        def launch(i):
+            try:
+                workers[i] = GrasshopperToPythonRemote(
+                    self.rpyc_server_py, **self.connector_kwargs
+                )
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=launch, args=(i,)) for i in range(self.n_workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            for worker in workers:
+                if worker is not None:
+                    _close_quietly(worker)
+            raise errors[0]
+        return workers
+
+
+def _make_chunk_call(module_name, function_name, chunk):
+    def call(worker):
+        payload = sharedmem.dumps(chunk, worker.shared_memory_threshold)
+        try:
+            map_chunk = worker._get_py_function(
+                "ghpythonremote.pythonservice", "map_chunk"
+            )
+            results = map_chunk(
+                module_name, function_name, payload, worker.shared_memory_threshold
+            )
+        except (socket.error, EOFError):
+            # A shared payload can only be loaded once, make a new one
+            worker._rebuild_py_remote()
+            return call(worker)
+        return sharedmem.loads(results)
+
+    return call
+
+
+def _cpu_count():
+    try:
+        import multiprocessing
+
+        return multiprocessing.cpu_count()
+    except (ImportError, NotImplementedError):
+        return int(os.environ.get("NUMBER_OF_PROCESSORS", 1))
+
+
+def _is_alive(connector):
+    return connector.python_popen.poll() is None and not connector.connection.closed
+
+
+def _close_quietly(connector):
+    try:
+        connector.close()
+    except Exception as e:
+        logger.debug("Error while closing a remote Python: {!s}".format(e))
@@ -1,8 +1,63 @@
+import hashlib
+import inspect
 import logging
+import os
+import socket
 import sys
+import threading
 
-from ghpythonremote import rpyc
-from rpyc.utils.server import OneShotServer
+from ghpythonremote import rpyc, sharedmem
+from rpyc.utils.server import OneShotServer, ThreadedServer
+
+logger = logging.getLogger("ghpythonremote.pythonservice")
+
+# Printed on stdout, followed by the bound port or socket path, once the server listens
+READY_MESSAGE = "ghpythonremote listening on"
+
+# Server modes: "oneshot" serves a single connection then exits, "threaded" serves any
+# number of connections concurrently, each with its own namespace, until stopped
+SERVER_MODES = ("oneshot", "threaded")
+
+# Compiled run_block sources, by hash of the source
+_compiled_blocks = {}
+MAX_COMPILED_BLOCKS = 256
+
+
+class NoDelayServerMixin(object):
+    """Disable Nagle's algorithm on accepted TCP connections, so that answers to
+    pipelined async requests are not held back waiting for the acknowledgment of the
+    previous one."""
+
+    def _accept_method(self, sock):
+        if sock.family != getattr(socket, "AF_UNIX", None):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        super(NoDelayServerMixin, self)._accept_method(sock)
+
+
+class AnnouncingServerMixin(NoDelayServerMixin):
+    """Announce on stdout when the server is ready to accept connections, with the
+    actual port it bound."""
+
+    def _listen(self):
+        if self.active:
+            return
+        super(AnnouncingServerMixin, self)._listen()
+        sys.stdout.write("{!s} {!s}\n".format(READY_MESSAGE, self.port))
+        sys.stdout.flush()
+
+
+class AnnouncingOneShotServer(AnnouncingServerMixin, OneShotServer):
+    """OneShotServer that announces on stdout when it is ready to accept the
+    connection."""
+
+
+class AnnouncingThreadedServer(AnnouncingServerMixin, ThreadedServer):
+    """ThreadedServer that announces on stdout when it is ready to accept
+    connections.
+
+    Each connection gets its own PythonService, so its own namespace, and is served in
+    its own thread. Imported modules are shared by all the connections.
+    """
 
 
 class PythonService(rpyc.ClassicService):
@@ -13,6 +68,93 @@ class PythonService(rpyc.ClassicService):
     def on_disconnect(self, conn):
         logger.info("Disconnected.")
 
+    def run_block(self, source, inputs=None, outputs=None, threshold=None):
+        """Execute a block of code with the given inputs, in a single round trip.
+
+        Parameters
+        ----------
+        source : str
+            Python code to execute. It is compiled once, and cached by hash.
+        inputs : tuple
+            sharedmem payload of a pickled dict of the variables to define before
+            executing the code.
+        outputs : tuple of str
+            Names of the variables to return. By default, all the variables that the
+            code defines, except modules, callables, and names starting with "_".
+        threshold : int
+            Size in bytes from which the result payload goes through shared memory.
+
+        Returns
+        -------
+        sharedmem payload of a pickled dict of the outputs. numpy arrays and scalars
+        are converted to lists and python scalars, so that IronPython can unpickle
+        them.
+        """
+        namespace = {} if inputs is None else sharedmem.loads(inputs)
+        input_names = set(namespace)
+        exec(_compile_block(source), namespace)
+        if outputs is None:
+            outputs = [
+                name
+                for name, value in namespace.items()
+                if not (
+                    name.startswith("_")
+                    or name in input_names
+                    or inspect.ismodule(value)
+                    or callable(value)
+                )
+            ]
+        result = dict((name, _to_builtin(namespace[name])) for name in outputs)
+        return sharedmem.dumps(result, threshold)
+
+
+def map_chunk(module_name, function_name, items, threshold=None):
+    """Apply a function to each item of a chunk, for RemotePythonPool.map.
+
+    items is a sharedmem payload of a pickled list, and the results are returned the
+    same way, in a single round trip for the whole chunk.
+    """
+    module = __import__(module_name, None, None, "*")
+    function = getattr(module, function_name)
+    results = [_to_builtin(function(item)) for item in sharedmem.loads(items)]
+    return sharedmem.dumps(results, threshold)
+
+
+def _exit_with_parent():
+    # stdin is a pipe from the connector, closed when the connector process exits
+    sys.stdin.read()
+    logger.info("Parent process exited, stopping.")
+    os._exit(0)
+
+
+def _compile_block(source):
+    if isinstance(source, unicode):
+        source = source.encode("utf-8")
+    key = hashlib.sha1(source).hexdigest()
+    try:
+        return _compiled_blocks[key]
+    except KeyError:
+        pass
+    if len(_compiled_blocks) >= MAX_COMPILED_BLOCKS:
+        _compiled_blocks.clear()
+    code = compile(source, "<run_block {!s}>".format(key[:8]), "exec")
+    _compiled_blocks[key] = code
+    return code
+
+
+def _to_builtin(value):
+    if isinstance(value, dict):
+        return dict((key, _to_builtin(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_to_builtin(item) for item in value]
+    if isinstance(value, tuple):
+        # Tuples stay tuples, like the results of a plain map
+        return tuple(_to_builtin(item) for item in value)
+    # numpy arrays and scalars
+    if hasattr(value, "tolist") and callable(value.tolist):
+        return value.tolist()
+    return value
+
 
 if __name__ == "__main__":
 
@@ -24,14 +166,25 @@ if __name__ == "__main__":
             log_level = getattr(logging, log_level, logging.WARNING)
     else:
         log_level = logging.WARNING
+    # The address is either a TCP port number, or the path of a unix domain socket
     if len(sys.argv) >= 2:
-        port = sys.argv[1]
+        address = sys.argv[1]
     else:
-        port = 18871
+        address = 18871
+    if len(sys.argv) >= 4:
+        server_mode = sys.argv[3]
+    else:
+        server_mode = "oneshot"
+    if server_mode not in SERVER_MODES:
+        raise ValueError(
+            "Unknown server mode {!s}, use one of {!s}.".format(
+                server_mode, ", ".join(SERVER_MODES)
+            )
+        )
     try:
-        port = int(port)
+        port, socket_path = int(address), None
     except (TypeError, ValueError):
-        port = 18871
+        port, socket_path = None, address
 
     # Log everything that happens on the Python server in the console
     logger = logging.getLogger()
@@ -44,13 +197,30 @@ if __name__ == "__main__":
     ch.setFormatter(formatter)
     logger.addHandler(ch)
 
-    logger = logging.getLogger("ghpythonremote.pythonservice")
-    logger.info("Starting server...")
-    server = OneShotServer(
-        PythonService,
-        hostname="localhost",
-        port=port,
-        listener_timeout=None,
-        logger=logger,
-    )
-    server.start()
+    if os.environ.get("GHPYTHONREMOTE_WATCH_STDIN"):
+        watchdog = threading.Thread(target=_exit_with_parent)
+        watchdog.daemon = True
+        watchdog.start()
+
+    logger.info("Starting {!s} server...".format(server_mode))
+    if server_mode == "threaded":
+        server_class = AnnouncingThreadedServer
+    else:
+        server_class = AnnouncingOneShotServer
+    if socket_path is None:
+        server = server_class(
+            PythonService,
+            hostname="localhost",
+            port=port,
+            listener_timeout=None,
+            logger=logger,
+        )
+    else:
+        server = server_class(
+            PythonService, socket_path=socket_path, listener_timeout=None, logger=logger,
+        )
+    try:
+        server.start()
+    finally:
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
@@ -0,0 +1,97 @@
+"""Draining of the output of the launched remote processes.
+
+The remote Python and Rhino write their logs to their stdout and stderr pipes. If
+nobody reads a pipe, it fills up, and the remote blocks on its next write, stalling
+every request in flight. OutputDrain reads the pipes in background threads, forwards
+each line to the "ghpythonremote.remote" logger, and keeps the last lines in a bounded
+ring buffer, so the volume of logs can never stall the remote.
+"""
+import logging
+import threading
+from collections import deque
+
+from .pythonservice import READY_MESSAGE
+
+logger = logging.getLogger("ghpythonremote.remote")
+
+# Default number of output lines kept by a connector
+DEFAULT_RETENTION = 1000
+
+
+class OutputDrain(object):
+    """Reads the output streams of a remote process, and keeps their last lines.
+
+    Parameters
+    ----------
+    retention : int
+        Number of lines kept, from all the streams. 0 to keep none, the lines are still
+        forwarded to the logger.
+    """
+
+    def __init__(self, retention=DEFAULT_RETENTION):
+        self.retention = max(0, retention)
+        self._lines = deque(maxlen=self.retention)
+        self._lock = threading.Lock()
+        self._threads = []
+
+    def drain(self, stream, name, log_level=logging.DEBUG, announcements=None):
+        """Read stream until it ends, in a background thread.
+
+        Parameters
+        ----------
+        stream : file
+            Output pipe of the remote process.
+        name : str
+            Name of the stream, prefixed to the lines, for example "stdout".
+        log_level : int
+            Level of the log records of the lines.
+        announcements : Queue
+            If given, the address of the first line that starts with READY_MESSAGE is
+            put in it, or None if the stream ends before.
+        """
+        thread = threading.Thread(
+            target=self._read, args=(stream, name, log_level, announcements)
+        )
+        thread.daemon = True
+        thread.start()
+        self._threads.append(thread)
+
+    def lines(self, n=None):
+        """Return the last n lines kept, or all of them, oldest first."""
+        with self._lock:
+            lines = list(self._lines)
+        if n is not None:
+            lines = lines[-n:] if n > 0 else []
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._lines.clear()
+
+    def join(self, timeout=None):
+        """Wait until all the streams end."""
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _read(self, stream, name, log_level, announcements):
+        try:
+            for line in iter(stream.readline, ""):
+                line = line.rstrip("\r\n")
+                if announcements is not None and line.startswith(READY_MESSAGE):
+                    announcements.put(line[len(READY_MESSAGE) :].strip())
+                    announcements = None
+                    continue
+                line = "[{!s}] {!s}".format(name, line)
+                with self._lock:
+                    self._lines.append(line)
+                logger.log(log_level, line)
+        except (IOError, OSError, ValueError) as e:
+            # The pipe was closed under us
+            logger.debug("Stopped reading remote {!s}: {!s}".format(name, e))
+        finally:
+            if announcements is not None:
+                announcements.put(None)
+            try:
+                stream.close()
+            except (IOError, OSError):
+                pass
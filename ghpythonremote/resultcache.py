@@ -0,0 +1,290 @@
+"""Memoization of Grasshopper component results, on the Rhino side.
+
+Results are cached by component name and by a hash of the inputs, including geometry,
+so that a hit avoids both the computation and the transfer of the inputs. The cache
+is disabled by default, enable it for all components or some of them:
+
+>>> cache = py2gh.result_cache  # or resultcache.cache inside Rhino
+>>> cache.enable("Area")
+>>> cache.stats()
+
+Cached results are shared by all the hits, do not modify them in place.
+"""
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from ghpythonremote import rpyc
+
+logger = logging.getLogger("ghpythonremote.resultcache")
+
+# Size in bytes assumed for a result whose size cannot be estimated
+DEFAULT_ITEM_SIZE = 64
+
+
+class Uncacheable(Exception):
+    """Raised when an input cannot be hashed reliably, the call is not cached."""
+
+
+class ResultCache(object):
+    """LRU cache of component results, bounded by number of entries and by memory.
+
+    Parameters
+    ----------
+    max_entries : int
+        Maximum number of results kept.
+    max_bytes : int
+        Maximum estimated memory size of the results kept, in bytes.
+    """
+
+    def __init__(self, max_entries=1024, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.enabled = False
+        self._enabled_names = set()
+        self._disabled_names = set()
+        self._entries = OrderedDict()
+        self._n_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lock = threading.RLock()
+
+    def enable(self, name=None):
+        """Cache the results of the component name, or of all components if name is
+        None."""
+        with self._lock:
+            if name is None:
+                self.enabled = True
+                self._disabled_names.clear()
+            else:
+                self._enabled_names.add(name)
+                self._disabled_names.discard(name)
+
+    def disable(self, name=None):
+        """Stop caching the results of the component name, or of all components if
+        name is None. Results already cached for it are dropped."""
+        with self._lock:
+            if name is None:
+                self.enabled = False
+                self._enabled_names.clear()
+                self.clear()
+            else:
+                self._disabled_names.add(name)
+                self._enabled_names.discard(name)
+                for key in [key for key in self._entries if key[0] == name]:
+                    self._remove(key)
+
+    def is_enabled(self, name):
+        if name in self._disabled_names:
+            return False
+        return self.enabled or name in self._enabled_names
+
+    def configure(self, max_entries=None, max_bytes=None):
+        """Change the limits of the cache, evicting results if needed."""
+        with self._lock:
+            if max_entries is not None:
+                self.max_entries = max_entries
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._n_bytes = 0
+
+    def stats(self):
+        """Return a dict of the hits, misses, evictions, entries, and bytes."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "entries": len(self._entries),
+                "bytes": self._n_bytes,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self._hits = 0
+            self._misses = 0
+            self._evictions = 0
+
+    def call(self, name, function, args, kwargs):
+        """Call function(*args, **kwargs), or return its cached result."""
+        if not self.is_enabled(name):
+            return function(*args, **kwargs)
+        try:
+            key = make_key(name, args, kwargs)
+        except Uncacheable as e:
+            logger.debug("Not caching {!s}: {!s}".format(name, e))
+            return function(*args, **kwargs)
+        with self._lock:
+            try:
+                result, size = self._entries.pop(key)
+            except KeyError:
+                self._misses += 1
+            else:
+                self._hits += 1
+                self._entries[key] = (result, size)
+                return result
+        result = function(*args, **kwargs)
+        size = estimate_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size <= self.max_bytes:
+                self._entries[key] = (result, size)
+                self._n_bytes += size
+                self._evict()
+        return result
+
+    def _remove(self, key):
+        _, size = self._entries.pop(key)
+        self._n_bytes -= size
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._n_bytes > self.max_bytes
+        ):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._n_bytes -= size
+            self._evictions += 1
+
+
+def cached(name, function):
+    """Wrap a component function to go through the result cache."""
+
+    def cached_function(*args, **kwargs):
+        return cache.call(name, function, args, kwargs)
+
+    cached_function.__name__ = getattr(function, "__name__", name)
+    cached_function.__doc__ = getattr(function, "__doc__", None)
+    return cached_function
+
+
+def make_key(name, args, kwargs):
+    """Key of a call in the cache: the component name and a SHA-1 of the inputs."""
+    digest = hashlib.sha1()
+    _update(digest, args)
+    _update(digest, sorted(kwargs.items()))
+    return name, digest.hexdigest()
+
+
+def _update(digest, value):
+    if isinstance(value, rpyc.core.netref.BaseNetref):
+        # Reading an object of the other side would take round trips
+        raise Uncacheable("input is a netref, send tuples instead of lists")
+    if value is None or isinstance(value, (bool, int, long, float, str, unicode)):
+        digest.update("{!s}:{!r};".format(type(value).__name__, value))
+    elif isinstance(value, (list, tuple)):
+        digest.update("{!s}[".format(type(value).__name__))
+        for item in value:
+            _update(digest, item)
+        digest.update("];")
+    elif isinstance(value, dict):
+        digest.update("dict{")
+        for item in sorted(value.items()):
+            _update(digest, item)
+        digest.update("};")
+    else:
+        _update_clr(digest, value)
+
+
+def _update_clr(digest, value):
+    try:
+        import System
+        import Rhino
+    except ImportError:
+        raise Uncacheable("cannot hash {!s}".format(type(value).__name__))
+    if isinstance(value, Rhino.Runtime.CommonObject):
+        # Geometry, by its serialized form
+        import Grasshopper as gh
+
+        data = gh.Kernel.GH_Convert.CommonObjectToByteArray(value)
+        if data is None:
+            raise Uncacheable("cannot serialize {!s}".format(type(value).__name__))
+        sha1 = System.Security.Cryptography.SHA1.Create()
+        digest.update("{!s}:{!s};".format(
+            value.GetType().FullName, System.BitConverter.ToString(sha1.ComputeHash(data))
+        ))
+    elif isinstance(value, System.ValueType):
+        value_type = value.GetType()
+        if _is_leaf_type(value_type):
+            _update_leaf(digest, value, value_type)
+            return
+        # Point3d, Plane, Color, and other structs, by their fields
+        digest.update("{!s}(".format(value_type.FullName))
+        for field in _get_fields(value_type):
+            field_value = field.GetValue(value)
+            if field.FieldType == value_type:
+                # A struct holding a value of its own type would recurse forever
+                _update_leaf(digest, field_value, value_type)
+            else:
+                _update(digest, field_value)
+        digest.update(");")
+    else:
+        raise Uncacheable("cannot hash {!s}".format(type(value).__name__))
+
+
+def _is_leaf_type(value_type):
+    """Primitive CLR types, enums and Guid, hashed by their value, not their fields.
+
+    Primitives like Single or Int64, that IronPython does not convert to Python
+    numbers, hold a private field of their own type.
+    """
+    return value_type.IsPrimitive or value_type.IsEnum or value_type.FullName in (
+        "System.Guid",
+        "System.Decimal",
+    )
+
+
+def _update_leaf(digest, value, value_type):
+    import System
+
+    if value_type.FullName in ("System.Single", "System.Double"):
+        # Round-trip format, the default one drops digits
+        text = value.ToString("R", System.Globalization.CultureInfo.InvariantCulture)
+    else:
+        text = value.ToString()
+    digest.update("{!s}:{!s};".format(value_type.FullName, text))
+
+
+_fields = {}
+
+
+def _get_fields(value_type):
+    try:
+        return _fields[value_type.FullName]
+    except KeyError:
+        import System
+
+        flags = (
+            System.Reflection.BindingFlags.Instance
+            | System.Reflection.BindingFlags.Public
+            | System.Reflection.BindingFlags.NonPublic
+        )
+        fields = sorted(value_type.GetFields(flags), key=lambda field: field.Name)
+        _fields[value_type.FullName] = fields
+        return fields
+
+
+def estimate_size(value):
+    """Estimate the memory size of a result, in bytes."""
+    if isinstance(value, (list, tuple)):
+        return 8 * len(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, (str, unicode)):
+        return len(value)
+    memory_estimate = getattr(value, "MemoryEstimate", None)
+    if memory_estimate is not None:
+        try:
+            return int(memory_estimate())
+        except Exception:
+            pass
+    return DEFAULT_ITEM_SIZE
+
+
+# Cache used by GhcompService and ghuserobjects
+cache = ResultCache()
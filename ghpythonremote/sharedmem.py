@@ -0,0 +1,105 @@
+"""Memory-mapped side-channel for large payloads.
+
+Both ends of the connection always run on the same machine, so payloads larger than
+a threshold are written to a memory-mapped temporary file, and only a small handle
+(path, size) crosses the rpyc socket. The receiving side maps the same file, reads it,
+and deletes it.
+
+Payloads are tuples that brine can encode in one message:
+    ("inline", data) for small payloads, sent through the socket;
+    ("shared", path, size) for large payloads, sent through the file.
+A shared payload can only be loaded once, its file is deleted when it is read.
+"""
+import logging
+import os
+import tempfile
+import uuid
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+try:
+    import mmap
+except ImportError:
+    mmap = None
+
+logger = logging.getLogger("ghpythonremote.sharedmem")
+
+PICKLE_PROTOCOL = 2
+FILE_PREFIX = "ghpythonremote-"
+
+
+def _write_shared(data):
+    path = os.path.join(
+        tempfile.gettempdir(), "{!s}{!s}.bin".format(FILE_PREFIX, uuid.uuid4().hex)
+    )
+    size = len(data)
+    with open(path, "w+b") as f:
+        if mmap is None or size == 0:
+            f.write(data)
+        else:
+            f.truncate(size)
+            region = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_WRITE)
+            try:
+                region[:] = data
+            finally:
+                region.close()
+    logger.debug("Wrote {:d} bytes to {!s}.".format(size, path))
+    return path, size
+
+
+def _read_shared(path, size):
+    if not os.path.exists(path):
+        raise RuntimeError(
+            "The shared memory file {!s} of the payload is gone: shared payloads can "
+            "only be loaded once, make a new payload to send the data again.".format(
+                path
+            )
+        )
+    try:
+        with open(path, "rb") as f:
+            if mmap is None or size == 0:
+                data = f.read(size)
+            else:
+                region = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                try:
+                    data = region[:]
+                finally:
+                    region.close()
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            logger.warning("Could not remove shared memory file {!s}.".format(path))
+    logger.debug("Read {:d} bytes from {!s}.".format(size, path))
+    return data
+
+
+def pack_bytes(data, threshold=None):
+    """Wrap a string of bytes in a payload, through shared memory if len(data) is
+    at least threshold. A threshold of None always sends the data inline."""
+    if threshold is not None and len(data) >= threshold:
+        path, size = _write_shared(data)
+        return "shared", path, size
+    return "inline", data
+
+
+def unpack_bytes(payload):
+    """Get the string of bytes back from a payload made by pack_bytes."""
+    if payload[0] == "shared":
+        return _read_shared(payload[1], payload[2])
+    elif payload[0] == "inline":
+        return payload[1]
+    raise ValueError("Unknown payload kind {!s}.".format(payload[0]))
+
+
+def dumps(obj, threshold=None):
+    """Pickle obj into a payload, through shared memory if it is large enough."""
+    return pack_bytes(pickle.dumps(obj, PICKLE_PROTOCOL), threshold)
+
+
+def loads(payload):
+    """Unpickle an object from a payload made by dumps."""
+    return pickle.loads(unpack_bytes(payload))
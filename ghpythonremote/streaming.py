@@ -0,0 +1,254 @@
+"""Streaming obtain of large remote objects, in chunks of bounded size.
+
+obtain copies a remote object in a single message: the remote serializes all of it
+before sending anything, doubling its memory use, and the local side waits for the
+whole result. obtain_iter instead creates a Cursor next to the object on the remote,
+that serializes it a chunk at a time, only when asked. Locally, a generator asks for
+chunks, keeping at most prefetch requests in flight, and yields each chunk as soon as
+it arrives, while the next ones are on their way. The remote never holds more than
+the chunks asked for, and nothing is asked for until the consumer catches up.
+
+Chunks are tuples that brine encodes in one message:
+    ("bytes", data) for a slice of a str, bytes or bytearray;
+    ("array", dtype, shape, buffer) for rows of a numpy.ndarray, see arrays;
+    ("pickles", (pickled_item, ...)) for items of any other iterable, pickled one by
+    one, until the chunk reaches the chunk size;
+    ("end",) once the object is exhausted.
+The items of a dict are its (key, value) pairs. An object that is not iterable is sent
+as a single chunk of one item. This module is imported on both sides of the
+connection.
+"""
+import logging
+import threading
+from collections import deque
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from ghpythonremote import rpyc
+from . import arrays
+
+logger = logging.getLogger("ghpythonremote.streaming")
+
+PICKLE_PROTOCOL = 2
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_PREFETCH = 2
+
+
+class Cursor(object):
+    """Serializes an object in chunks of about chunk_size bytes, one per call of
+    next_chunk. Runs on the side that holds the object.
+
+    Parameters
+    ----------
+    obj : object
+        Object to serialize. Iterators are consumed as chunks are asked for.
+    chunk_size : int
+        Number of bytes after which a chunk is closed. A chunk holds at least one
+        item, so an item larger than chunk_size makes a larger chunk.
+    """
+
+    def __init__(self, obj, chunk_size=DEFAULT_CHUNK_SIZE):
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive.")
+        self.chunk_size = int(chunk_size)
+        self.n_chunks = 0
+        self._lock = threading.Lock()
+        self._obj = obj
+        self._position = 0
+        self._items = None
+        self._kind = _kind_of(obj)
+        if self._kind == "pickles":
+            self._items = _iter_items(obj)
+
+    def next_chunk(self):
+        """Serialize the next chunk, ("end",) when the object is exhausted."""
+        with self._lock:
+            if self._obj is None:
+                return ("end",)
+            if self._kind == "bytes":
+                chunk = self._next_bytes()
+            elif self._kind == "array":
+                chunk = self._next_rows()
+            else:
+                chunk = self._next_pickles()
+            if chunk is None:
+                self._release()
+                return ("end",)
+            self.n_chunks += 1
+            return chunk
+
+    def close(self):
+        """Drop the object, to release it before the cursor itself."""
+        with self._lock:
+            self._release()
+
+    def _release(self):
+        self._obj = None
+        self._items = None
+
+    def _next_bytes(self):
+        start = self._position
+        if start >= len(self._obj):
+            return None
+        self._position = start + self.chunk_size
+        # bytes of a bytearray slice, that brine would send as a netref
+        return "bytes", bytes(self._obj[start : self._position])
+
+    def _next_rows(self):
+        values = self._obj
+        start = self._position
+        if start >= len(values):
+            return None
+        row_size = max(1, values.nbytes // max(1, len(values)))
+        self._position = start + max(1, self.chunk_size // row_size)
+        return ("array",) + arrays.from_ndarray(values[start : self._position])
+
+    def _next_pickles(self):
+        pickled = []
+        size = 0
+        for item in self._items:
+            data = pickle.dumps(item, PICKLE_PROTOCOL)
+            pickled.append(data)
+            size += len(data)
+            if size >= self.chunk_size:
+                break
+        if not pickled:
+            return None
+        return "pickles", tuple(pickled)
+
+
+def _kind_of(obj):
+    if isinstance(obj, (str, bytes, bytearray)):
+        return "bytes"
+    dtype = getattr(obj, "dtype", None)
+    if dtype is not None and getattr(obj, "ndim", 0) > 0:
+        if str(dtype) in arrays.TYPECODES:
+            return "array"
+    return "pickles"
+
+
+def _iter_items(obj):
+    if isinstance(obj, dict):
+        return iter(obj.items())
+    if isinstance(obj, unicode):
+        return iter((obj,))
+    try:
+        return iter(obj)
+    except TypeError:
+        return iter((obj,))
+
+
+def decode_chunk(chunk, as_numpy=True):
+    """Return the values of a chunk: a str, a numpy.ndarray, or a list of items.
+
+    Without numpy, or with as_numpy False, rows of arrays are returned as nested
+    lists.
+    """
+    kind = chunk[0]
+    if kind == "bytes":
+        return chunk[1]
+    if kind == "array":
+        if as_numpy:
+            try:
+                return arrays.to_ndarray(*chunk[1:])
+            except ImportError:
+                pass
+        return arrays.unpack(*chunk[1:])
+    if kind == "pickles":
+        return [pickle.loads(data) for data in chunk[1]]
+    raise ValueError("Unknown chunk kind {!s}.".format(kind))
+
+
+def iter_chunks(remote_cursor, prefetch=DEFAULT_PREFETCH, as_numpy=True):
+    """Yield the values of the chunks of a remote Cursor, see decode_chunk.
+
+    Keeps at most prefetch requests for chunks in flight, so that the next chunks are
+    on their way while the consumer processes the current one. The remote cursor is
+    closed when the generator is exhausted or closed.
+    """
+    prefetch = max(1, int(prefetch))
+    next_chunk = rpyc.async_(remote_cursor.next_chunk)
+    pending = deque()
+    is_exhausted = False
+    try:
+        while True:
+            while not is_exhausted and len(pending) < prefetch:
+                pending.append(next_chunk())
+            if not pending:
+                return
+            chunk = pending.popleft().value
+            if chunk[0] == "end":
+                is_exhausted = True
+                continue
+            yield decode_chunk(chunk, as_numpy)
+    finally:
+        # Wait for the requests in flight, their replies would arrive later anyway
+        for async_result in pending:
+            try:
+                async_result.wait()
+            except Exception:
+                pass
+        try:
+            remote_cursor.close()
+        except (EOFError, IOError, OSError):
+            pass
+
+
+def check_remote(remote_obj):
+    """Raise TypeError if remote_obj is not a netref: streaming a local object would
+    first upload all of it."""
+    if not isinstance(remote_obj, rpyc.core.netref.BaseNetref):
+        raise TypeError(
+            "obtain_iter streams remote objects, got a local {!s}.".format(
+                type(remote_obj).__name__
+            )
+        )
+
+
+def obtain_iter(
+    remote_obj,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    prefetch=DEFAULT_PREFETCH,
+    as_numpy=True,
+):
+    """Copy a remote object to the local in chunks, like a streaming obtain.
+
+    The remote must be served by a classic service, like the servers of
+    ghpythonremote.
+
+    Parameters
+    ----------
+    remote_obj : netref
+        Remote object. str, bytes and bytearray are streamed in slices, numpy.ndarray
+        in rows, other iterables item by item, and dicts as (key, value) pairs.
+    chunk_size : int
+        Approximate size of the chunks, in bytes.
+    prefetch : int
+        Number of chunks requested ahead of the consumer.
+    as_numpy : bool
+        Return rows of numpy arrays as numpy arrays, otherwise as nested lists.
+
+    Returns
+    -------
+    Generator of the values of the chunks: str slices, numpy.ndarray of rows, or lists
+    of items.
+
+    Raises
+    ------
+    TypeError if remote_obj is not a netref.
+
+    Examples
+    --------
+    >>> total = 0
+    >>> for rows in ghpythonremote.obtain_iter(remote_array, chunk_size=2**20):
+    >>>     total += rows.sum()
+    """
+    check_remote(remote_obj)
+    connection = object.__getattribute__(remote_obj, "____conn__")
+    cursor = connection.modules["ghpythonremote.streaming"].Cursor(
+        remote_obj, chunk_size
+    )
+    return iter_chunks(cursor, prefetch, as_numpy)
@@ -0,0 +1,349 @@
+"""Tracing of the rpyc requests of a connection, to find chatty code paths.
+
+Innocent-looking code on netrefs, like ``np.array(x).mean()``, can send dozens of
+requests, each a round trip. Within a trace, every request sent or received on the
+connection is counted by handler (getattr, call, inspect, del...), with the bytes sent
+and received, and optionally recorded with its target and duration:
+
+>>> with gh2py.trace() as t:
+>>>     np.array(x).mean()
+>>> t.summary()
+>>> print(t.format())
+
+Tracing installs hooks on the connection only while a trace is active. Netrefs
+released during a trace send del requests that count in it.
+"""
+import logging
+import threading
+import time
+
+from ghpythonremote import rpyc
+
+logger = logging.getLogger("ghpythonremote.tracing")
+
+consts = rpyc.core.consts
+
+# Handler number -> name, for example consts.HANDLE_GETATTR -> "getattr"
+HANDLER_NAMES = dict(
+    (value, name[len("HANDLE_") :].lower())
+    for name, value in vars(consts).items()
+    if name.startswith("HANDLE_")
+)
+
+# Handlers whose second argument is an attribute name
+_ATTR_HANDLERS = (
+    consts.HANDLE_GETATTR,
+    consts.HANDLE_SETATTR,
+    consts.HANDLE_DELATTR,
+    consts.HANDLE_CALLATTR,
+)
+
+
+class CallRecord(object):
+    """A request of a trace, sent ("out") or received ("in")."""
+
+    __slots__ = (
+        "start",
+        "direction",
+        "handler",
+        "target",
+        "sent_bytes",
+        "received_bytes",
+        "duration",
+        "is_exception",
+    )
+
+    def __init__(self, start, direction, handler, target):
+        self.start = start
+        self.direction = direction
+        self.handler = handler
+        self.target = target
+        self.sent_bytes = 0
+        self.received_bytes = 0
+        # None until the reply arrives, or forever for an async request not waited for
+        self.duration = None
+        self.is_exception = False
+
+    def __repr__(self):
+        return "<CallRecord {!s} {!s} {!s}>".format(
+            self.direction, self.handler, self.target
+        )
+
+
+class RPCTrace(object):
+    """Context manager that traces the requests of an rpyc connection.
+
+    Parameters
+    ----------
+    connection : rpyc.Connection
+        Connection to trace. Usually created with the trace method of the connectors.
+    record_calls : bool
+        Record each request in records, in addition to the counts.
+    max_records : int
+        Maximum number of requests recorded, the following ones are only counted.
+
+    Attributes
+    ----------
+    counts : dict
+        Number of requests sent, by handler name.
+    incoming_counts : dict
+        Number of requests received from the other side, by handler name.
+    bytes_sent, bytes_received : int
+        Bytes of the messages sent and received, before compression.
+    wall_time : float
+        Duration of the trace, in seconds.
+    records : list of CallRecord
+        Requests, in the order they were sent or received.
+    """
+
+    def __init__(self, connection, record_calls=True, max_records=10000):
+        self.connection = connection
+        self.record_calls = record_calls
+        self.max_records = max_records
+        self.counts = {}
+        self.incoming_counts = {}
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.wall_time = 0.0
+        self.records = []
+        self.n_dropped_records = 0
+        self._start = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def n_requests(self):
+        """Number of requests sent, so of round trips if they were all waited for."""
+        return sum(self.counts.values())
+
+    def start(self):
+        self._start = time.time()
+        _Tracer.get(self.connection).add(self)
+
+    def stop(self):
+        if self._start is None:
+            return
+        _Tracer.get(self.connection).remove(self)
+        self.wall_time += time.time() - self._start
+        self._start = None
+
+    def summary(self):
+        """Return a dict of the counts, bytes, and wall time."""
+        with self._lock:
+            return {
+                "n_requests": self.n_requests,
+                "counts": dict(self.counts),
+                "incoming_counts": dict(self.incoming_counts),
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+                "wall_time": self.wall_time,
+            }
+
+    def format(self):
+        """Format the recorded requests as a table, one line per request."""
+        lines = [
+            "{:>10s} {:>3s} {:<10s} {:>9s} {:>9s} {:>10s}  {!s}".format(
+                "start_ms", "dir", "handler", "sent_B", "recv_B", "time_ms", "target"
+            )
+        ]
+        for record in self.records:
+            lines.append(
+                "{:10.3f} {:>3s} {:<10s} {:9d} {:9d} {:>10s}  {!s}{!s}".format(
+                    1e3 * (record.start - self.records[0].start),
+                    record.direction,
+                    record.handler,
+                    record.sent_bytes,
+                    record.received_bytes,
+                    "-"
+                    if record.duration is None
+                    else "{:.3f}".format(1e3 * record.duration),
+                    record.target,
+                    " (exception)" if record.is_exception else "",
+                )
+            )
+        if self.n_dropped_records:
+            lines.append(
+                "... {:d} more requests not recorded.".format(self.n_dropped_records)
+            )
+        return "\n".join(lines)
+
+    def dump(self, log_level=logging.INFO):
+        """Log the summary and the recorded requests."""
+        logger.log(log_level, "RPC trace summary: {!s}".format(self.summary()))
+        logger.log(log_level, "RPC trace:\n{!s}".format(self.format()))
+
+    def _count(self, counts, handler):
+        with self._lock:
+            counts[handler] = counts.get(handler, 0) + 1
+
+    def _add_record(self, record):
+        with self._lock:
+            if not self.record_calls:
+                return
+            if len(self.records) < self.max_records:
+                self.records.append(record)
+            else:
+                self.n_dropped_records += 1
+
+    def _add_bytes(self, n_sent, n_received):
+        with self._lock:
+            self.bytes_sent += n_sent
+            self.bytes_received += n_received
+
+
+class _Tracer(object):
+    """Hooks installed on a connection while at least one RPCTrace is active. Events
+    go to all the active traces, so traces can be nested."""
+
+    # Connection methods replaced by instance attributes while tracing
+    HOOKED = ("_async_request", "_dispatch", "_dispatch_request")
+
+    _lock = threading.Lock()
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.traces = []
+        self._local = threading.local()
+        self._channel = None
+
+    @classmethod
+    def get(cls, connection):
+        with cls._lock:
+            tracer = connection.__dict__.get("_ghpythonremote_tracer")
+            if tracer is None:
+                tracer = cls(connection)
+                connection._ghpythonremote_tracer = tracer
+            return tracer
+
+    def add(self, trace):
+        with self._lock:
+            if not self.traces:
+                self._install()
+            self.traces.append(trace)
+
+    def remove(self, trace):
+        with self._lock:
+            self.traces.remove(trace)
+            if not self.traces:
+                self._uninstall()
+
+    def _install(self):
+        connection = self.connection
+        self._channel = connection._channel
+        connection._channel = _TracedChannel(self._channel, self._send)
+        connection._async_request = self._async_request
+        connection._dispatch = self._dispatch
+        connection._dispatch_request = self._dispatch_request
+
+    def _uninstall(self):
+        connection = self.connection
+        connection._channel = self._channel
+        for name in self.HOOKED:
+            del connection.__dict__[name]
+        self._channel = None
+
+    def _records(self, direction, handler, target):
+        """Count a request in all the active traces, and return its records."""
+        handler = HANDLER_NAMES.get(handler, str(handler))
+        start = time.time()
+        records = []
+        for trace in list(self.traces):
+            counts = trace.counts if direction == "out" else trace.incoming_counts
+            trace._count(counts, handler)
+            record = CallRecord(start, direction, handler, target)
+            trace._add_record(record)
+            records.append(record)
+        return records
+
+    def _send(self, data):
+        # Bytes go to the request being sent or answered by this thread, if any
+        records = getattr(self._local, "records", None) or ()
+        for record in records:
+            record.sent_bytes += len(data)
+        for trace in list(self.traces):
+            trace._add_bytes(len(data), 0)
+        return self._channel.send(data)
+
+    def _async_request(self, handler, args=(), callback=(lambda a, b: None)):
+        records = self._records("out", handler, _describe(handler, args))
+
+        def traced_callback(is_exc, obj):
+            end = time.time()
+            n_received = getattr(self._local, "received_bytes", 0)
+            for record in records:
+                record.duration = end - record.start
+                record.received_bytes += n_received
+                record.is_exception = is_exc
+            return callback(is_exc, obj)
+
+        previous = getattr(self._local, "records", None)
+        self._local.records = records
+        try:
+            return type(self.connection)._async_request(
+                self.connection, handler, args, traced_callback
+            )
+        finally:
+            self._local.records = previous
+
+    def _dispatch(self, data):
+        for trace in list(self.traces):
+            trace._add_bytes(0, len(data))
+        previous = getattr(self._local, "received_bytes", 0)
+        self._local.received_bytes = len(data)
+        try:
+            return type(self.connection)._dispatch(self.connection, data)
+        finally:
+            self._local.received_bytes = previous
+
+    def _dispatch_request(self, seq, raw_args):
+        handler = raw_args[0]
+        records = self._records("in", handler, "")
+        n_received = getattr(self._local, "received_bytes", 0)
+        for record in records:
+            record.received_bytes = n_received
+        previous = getattr(self._local, "records", None)
+        self._local.records = records
+        try:
+            return type(self.connection)._dispatch_request(
+                self.connection, seq, raw_args
+            )
+        finally:
+            self._local.records = previous
+            end = time.time()
+            for record in records:
+                record.duration = end - record.start
+
+
+class _TracedChannel(object):
+    """Channel that reports the messages it sends. rpyc channels have __slots__, so
+    their send method cannot be replaced on the instance."""
+
+    def __init__(self, channel, send):
+        self._channel = channel
+        self.send = send
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+def _describe(handler, args):
+    """Describe the target of a request without sending any request."""
+    if not args:
+        return ""
+    obj = args[0]
+    if handler == consts.HANDLE_INSPECT and isinstance(obj, tuple):
+        # The argument is the id_pack of the remote class
+        return obj[0]
+    try:
+        name = object.__getattribute__(obj, "____id_pack__")[0]
+    except (AttributeError, TypeError):
+        name = type(obj).__name__
+    if handler in _ATTR_HANDLERS and len(args) > 1 and isinstance(args[1], basestring):
+        name = "{!s}.{!s}".format(name, args[1])
+    return name
@@ -0,0 +1,55 @@
+"""Round trips of value objects through the geometry codecs, without Rhino.
+
+Run with: python -m unittest discover -s tests
+"""
+import unittest
+
+import numpy
+
+from ghpythonremote import geometrycodec, meshbuffers
+
+VERTICES = numpy.array(
+    [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [1.0, 1.0, 0.0], [0.0, 1.0, 0.0]]
+)
+TRIANGLES = numpy.array([[0, 1, 2], [0, 2, 3]])
+PADDED_TRIANGLES = [[0, 1, 2, 2], [0, 2, 3, 3]]
+
+
+class TestMeshCodec(unittest.TestCase):
+    def round_trip(self, mesh, as_numpy):
+        encoded = geometrycodec.encode_value(mesh)
+        self.assertTrue(geometrycodec.is_encoded(encoded))
+        return geometrycodec.decode(encoded, as_numpy=as_numpy)
+
+    def test_ndarray_triangles(self):
+        mesh = self.round_trip(geometrycodec.Mesh(VERTICES, TRIANGLES), True)
+        self.assertEqual(mesh.faces.dtype, numpy.int32)
+        self.assertEqual(mesh.faces.tolist(), PADDED_TRIANGLES)
+        self.assertEqual(mesh.vertices.tolist(), VERTICES.tolist())
+
+    def test_ndarray_quads(self):
+        quads = numpy.array([[0, 1, 2, 3]])
+        mesh = self.round_trip(geometrycodec.Mesh(VERTICES, quads), True)
+        self.assertEqual(mesh.faces.tolist(), [[0, 1, 2, 3]])
+
+    def test_mixed_sequence_faces(self):
+        faces = [(0, 1, 2), (0, 1, 2, 3)]
+        mesh = self.round_trip(geometrycodec.Mesh(VERTICES.tolist(), faces), False)
+        self.assertEqual(mesh.faces, ((0, 1, 2, 2), (0, 1, 2, 3)))
+        self.assertEqual(mesh.vertices[2], geometrycodec.Point3d(1.0, 1.0, 0.0))
+
+
+class TestPackFaces(unittest.TestCase):
+    def test_ndarray_and_sequence_agree(self):
+        self.assertEqual(
+            meshbuffers.pack_faces(TRIANGLES), meshbuffers.pack_faces(TRIANGLES.tolist())
+        )
+
+    def test_from_value_pads_triangles(self):
+        packed = meshbuffers.from_value(VERTICES, TRIANGLES, threshold=1)
+        faces = meshbuffers.to_value(packed).faces
+        self.assertEqual(faces.tolist(), PADDED_TRIANGLES)
+
+
+if __name__ == "__main__":
+    unittest.main()
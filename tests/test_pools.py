@@ -0,0 +1,49 @@
+"""RemotePythonPool with remote interpreters launched from this Python, that must
+have ghpythonremote installed.
+
+Run with: python -m unittest discover -s tests
+"""
+import inspect
+import logging
+import sys
+import threading
+import time
+import unittest
+from os import path
+
+import ghpythonremote
+from ghpythonremote.pools import RemotePythonPool
+
+ROOT = path.abspath(path.dirname(inspect.getfile(ghpythonremote)))
+rpyc_server_py = path.join(ROOT, "pythonservice.py")
+
+
+class TestRemotePythonPool(unittest.TestCase):
+    def test_map_after_worker_killed_with_shared_chunk(self):
+        # Pickled, the chunk is about 2 kB, so it goes through shared memory
+        items = [0.01] * 200
+        with RemotePythonPool(
+            rpyc_server_py,
+            n_workers=1,
+            python_exe=sys.executable,
+            timeout=20,
+            log_level=logging.WARNING,
+            shared_memory_threshold=1024,
+        ) as pool:
+            python_popen = pool.workers[0].python_popen
+
+            def kill():
+                # While the worker sleeps through the chunk, after it read the payload
+                time.sleep(0.5)
+                python_popen.kill()
+
+            killer = threading.Thread(target=kill)
+            killer.start()
+            results = pool.map("time", "sleep", items, chunksize=len(items))
+            killer.join()
+            self.assertIsNot(pool.workers[0].python_popen, python_popen)
+            self.assertEqual(results, [None] * len(items))
+
+
+if __name__ == "__main__":
+    unittest.main()